@@ -1,13 +1,18 @@
 import math
+import time
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Ellipse, Circle
 from scipy.optimize import root
 
+from lib import instrument
+from lib.quartic import smallest_positive_root
+
 a, b = 4, 2
 attraction_point = [0.0, 0.0]
 attraction_radius = 0.5
 gravity = 1.0
+instrumentation = False  # per-condition event counts, timings and field errors (lib.instrument)
 
 initial_conditions = [
     ([0.0, 1.5], np.pi / 3),
@@ -19,6 +24,8 @@ initial_conditions = [
 fig, (ax_position, ax_position_angle) = plt.subplots(1, 2, figsize=(10, 5))
 colors = ['b', 'g', 'r', 'm']
 
+probe = instrument.enable() if instrumentation else None
+
 ellipse = Ellipse([0, 0], 2 * a, 2 * b, edgecolor='b', fc='None')
 a_point = Circle([attraction_point[0], attraction_point[1]], attraction_radius, edgecolor='r', fc='r', alpha=0.3)
 ax_position.add_patch(ellipse)
@@ -73,7 +80,11 @@ def calculate_reflection_position_angle(x, y, vx, vy, a, b):
     return x_new, y_new, t_collision,0,0,0
 
 
-def calculate_touching_position_angle_of_attraction_field(x, y, vx, vy, a, b, m, n, gravity, num_field, num_edge, field):
+def calculate_touching_position_angle_of_attraction_field(x, y, vx, vy, a, b, m, n, gravity):
+    probe = instrument.active
+    if probe is not None:
+        start = time.perf_counter()
+
     # Calculate collision with ellipse
     x_new, y_new, t_collision_to_shape, _, _, _ = calculate_reflection_position_angle(x, y, vx, vy, a, b)
     
@@ -90,48 +101,35 @@ def calculate_touching_position_angle_of_attraction_field(x, y, vx, vy, a, b, m,
     E = cx**2 + cy**2 - (attraction_radius**2)
     coeffs = [A, B, C, D, E]
     
-    try:
-        roots = np.roots(coeffs)
-        real_roots = roots[np.isreal(roots)].real
-        positive_times = [t for t in real_roots if t > 0]
-    except Exception as e:
-        print("Error computing roots:", e)
-        positive_times = []
-        
-    if positive_times:
-        t_collision_to_attraction_field = min(positive_times)
-    else:
-        print("no pos sol")
-        t_collision_to_attraction_field = float('inf')
+    t_collision_to_attraction_field = smallest_positive_root([coeffs], t_min=0.0)[0]
     
     # If no collision is found for either, return current state to avoid infinite updates.
     if t_collision_to_shape is None and t_collision_to_attraction_field == float('inf'):
-        print("No collision with either shape or attraction field.")
-        return x, y, 0, vx, vy, num_field, num_edge, field
+        if probe is not None:
+            probe.count('no_root')
+            probe.add_time('no_root', time.perf_counter() - start)
+        return x, y, 0, vx, vy, False
 
     # Use ellipse collision if it occurs first (or if attraction collision time is infinite)
     if t_collision_to_shape is not None and t_collision_to_shape <= t_collision_to_attraction_field:
-        num_edge += 1
         vx, vy = reflect_off_ellipse(x_new, y_new, vx, vy, a, b)
-        return x_new, y_new, t_collision_to_shape, vx, vy, num_field, num_edge, field
+        if probe is not None:
+            probe.count('ellipse')
+            probe.add_time('ellipse', time.perf_counter() - start)
+        return x_new, y_new, t_collision_to_shape, vx, vy, False
     else:
-        # If attraction collision time is infinite, do not update further.
-        if t_collision_to_attraction_field == float('inf'):
-            print("No attraction collision detected; returning current state.")
-            return x, y, 0, vx, vy, num_field, num_edge, field
-        print('v diff:', (x - m) * gravity * t_collision_to_attraction_field)
         vx_new = (x - m) * gravity * t_collision_to_attraction_field + vx
         vy_new = (y - n) * gravity * t_collision_to_attraction_field + vy
         x_new = x + vx_new * t_collision_to_attraction_field
         y_new = y + vy_new * t_collision_to_attraction_field
-        new_pos_to_field = abs(x_new**2 + y_new**2 - attraction_radius**2)
-        print('field pos cal error:', new_pos_to_field, 'at', num_field, 'time')
-        print('field position:', x_new, y_new)
-        print('original v:', vx, vy)
-        print('field velocity:', vx_new, vy_new)
-        num_field += 1
-        field = True
-        return x_new, y_new, t_collision_to_attraction_field, vx_new, vy_new, num_field, num_edge, field
+        if probe is not None:
+            # Moving outwards at the crossing: leaving the field.
+            kind = 'field_exit' if (x_new - m) * vx_new + (y_new - n) * vy_new > 0 else 'field_entry'
+            probe.count(kind)
+            probe.add_time(kind, time.perf_counter() - start)
+            probe.error('field_position', abs(x_new**2 + y_new**2 - attraction_radius**2))
+            probe.error('field_dv', math.hypot(vx_new - vx, vy_new - vy))
+        return x_new, y_new, t_collision_to_attraction_field, vx_new, vy_new, True
 
 
 for idx, (initial_position, initial_angle) in enumerate(initial_conditions):
@@ -139,17 +137,14 @@ for idx, (initial_position, initial_angle) in enumerate(initial_conditions):
     velocity = [np.cos(initial_angle), np.sin(initial_angle)]
     position_angle_data = []
     position_data = []
-    num_edge = 0
-    num_field = 0
 
     n_reflection = 4
     for _ in range(n_reflection):
         x_0, y_0 = position
         vx, vy = velocity
-        field = False
 
-        x_new, y_new, t_collision, vx, vy, num_field, num_edge, field = calculate_touching_position_angle_of_attraction_field(
-            x_0, y_0, vx, vy, a, b, attraction_point[0], attraction_point[1], gravity, num_field, num_edge, field
+        x_new, y_new, t_collision, vx, vy, field = calculate_touching_position_angle_of_attraction_field(
+            x_0, y_0, vx, vy, a, b, attraction_point[0], attraction_point[1], gravity
         )
         
         angle = np.arctan2(vy, vx)
@@ -161,8 +156,10 @@ for idx, (initial_position, initial_angle) in enumerate(initial_conditions):
         position = [x_new, y_new]
         position_data.append((position[0],position[1]))
 
-    print('edge:', num_edge)
-    print('field:', num_field)
+    if probe is not None:
+        print(f'condition {idx + 1}:')
+        print(probe.report())
+        probe.reset()
     if position_angle_data:
         pa_x, pa_y = zip(*position_angle_data)
         # p_x, p_y = zip(*position_data)
@@ -6,6 +6,7 @@ from matplotlib.patches import Ellipse, Circle
 from queue import Queue
 
 from lib.wall import wall
+from lib.wallindex import WallIndex
 
 
 walls = [
@@ -79,29 +80,16 @@ def calculate_tangent_velocity(x, y, vx, vy, a, b):
     tangent_velocity = vx * tangent_x + vy * tangent_y
     return np.abs(tangent_velocity)
 
-def processWalls(wallList : list) -> tuple:
-    if (len(wallList) == 0):
+wallIndex = WallIndex(walls)
+
+def processWalls(index : WallIndex) -> tuple:
+    if (len(index.walls) == 0):
         return None
     
-    art = [] * 5
-    #run sorting algo based on distance, idc
-
-    for w in wallList:
-        intersect, tangentVelocity = w.getIntersect(position, velocity)
-        if intersect != None:
-            dist = np.sqrt(
-                (position[0] - intersect[0])**2 + (position[1] - intersect[1])**2
-            )
-            art.append([dist, intersect, tangentVelocity])
-    
-    closest = 1000
-    ret = [None, None]
-    for pack in art:
-        if (pack[0] < closest):
-            closest = pack[0]
-            ret = [pack[1], pack[2]]
+    #only walls whose bounding box the ray reaches are tested
+    hitWall, intersect, tangentVelocity, dist = index.nearest(position, velocity)
     
-    return ret
+    return [intersect, tangentVelocity]
 
 def plotAll():
     x_new, y_new = position
@@ -121,7 +109,7 @@ trajectory_line.set_data(trajectory_x, trajectory_y)
 
 for i in range(0,64):
    
-    new_pos, new_vel = processWalls(walls)
+    new_pos, new_vel = processWalls(wallIndex)
     if (new_pos != None):
         trajectory.append(new_pos)
         trajectory.append(position)
@@ -3,10 +3,14 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Ellipse, Circle
 
+from lib.histogram import PhaseHistogram
+from lib.render import shade, imshow_overlay
+
 a, b = 2, 1
 attraction_point = [0.0, 0.0]
 attraction_radius = 0.5
 gravity = 100.0
+render_mode = "points"   # "points" (one marker per bounce) or "raster" (binned image, for long runs)
 
 initial_conditions = [
     ([0.0, 1.5], np.pi / 3),
@@ -63,6 +67,18 @@ def calculate_reflection_position_angle(x, y, vx, vy, a, b):
     y_new = y + vy * t_collision
     return x_new, y_new, t_collision
 
+phase_range, phase_bins = ((-a, a), (0, 1.0)), (400, 200)
+position_angle_range, position_angle_bins = ((-a - 1, 3 * a + 1), (0, np.pi)), (800, 300)
+raster_chunk = 4096      # bounces buffered before they are binned in raster mode
+phase_histograms = [PhaseHistogram(phase_bins, phase_range) for _ in colors]
+position_angle_histograms = [PhaseHistogram(position_angle_bins, position_angle_range) for _ in colors]
+
+def bin_points(histogram, points):
+    # Move buffered (u, w) points into the histogram and empty the buffer.
+    if points:
+        histogram.add(*np.array(points).T)
+        points.clear()
+
 for idx, (initial_position, initial_angle) in enumerate(initial_conditions):
     position = initial_position
     velocity = [np.cos(initial_angle), np.sin(initial_angle)]
@@ -89,6 +105,16 @@ for idx, (initial_position, initial_angle) in enumerate(initial_conditions):
 
             position = [x_new, y_new]
 
+            # Long raster runs keep at most raster_chunk points in memory.
+            if render_mode == "raster" and len(phase_data) >= raster_chunk:
+                bin_points(phase_histograms[idx], phase_data)
+                bin_points(position_angle_histograms[idx], position_angle_data)
+
+    if render_mode == "raster":
+        bin_points(phase_histograms[idx], phase_data)
+        bin_points(position_angle_histograms[idx], position_angle_data)
+        continue
+
     if phase_data:
         phase_x, phase_y = zip(*phase_data)
         ax_phase.plot(phase_x, phase_y, 'o', color=colors[idx], markersize=3, label=f'Initial condition {idx + 1}')
@@ -97,7 +123,11 @@ for idx, (initial_position, initial_angle) in enumerate(initial_conditions):
         pa_x, pa_y = zip(*position_angle_data)
         ax_position_angle.plot(pa_x, pa_y, 'o', color=colors[idx], markersize=3, label=f'Initial condition {idx + 1}')
 
-ax_phase.legend()
-ax_position_angle.legend()
+if render_mode == "raster":
+    imshow_overlay(ax_phase, shade(phase_histograms, colors), phase_range)
+    imshow_overlay(ax_position_angle, shade(position_angle_histograms, colors), position_angle_range)
+else:
+    ax_phase.legend()
+    ax_position_angle.legend()
 
 plt.show()
@@ -4,17 +4,23 @@ import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from matplotlib.patches import Ellipse, Circle
 
+from lib.trail import RingBuffer, PointBuffer
+
 # Ellipse parameters and initial conditions
 a, b = 4, 2
 step = 0.01
 attraction_point = [0.0, 0.0]
 attraction_radius = 0.5
 gravity = 0.005
+steps_per_frame = 1      # physics steps advanced per rendered frame
+trail_length = 2000      # points kept in the trajectory trail
+phase_length = None      # bounces kept in the phase plots (None: all of them)
 
 # Initial position and angle
 position = [0.5, -1.5]
 angle = 2 * np.pi / 3
 velocity = [np.cos(angle), np.sin(angle)]
+bounces = 0
 
 # Setting up the plots
 ellipse = Ellipse([0, 0], 2 * a, 2 * b, edgecolor='b', fc='None')
@@ -27,7 +33,7 @@ ax.add_patch(ellipse)
 ax.add_patch(a_point)
 ball, = ax.plot([], [], 'ro')
 trajectory_line, = ax.plot([], [], 'b-', linewidth=0.5)
-trajectory = []
+trajectory = RingBuffer(trail_length)
 
 # Phase space setup
 ax_phase.set_xlim(-a, a)
@@ -35,7 +41,7 @@ ax_phase.set_ylim(0, 1.0)
 ax_phase.set_xlabel("x-coordinate (at bounce)")
 ax_phase.set_ylabel("tangent velocity (at bounce)")
 phase_points, = ax_phase.plot([], [], 'bo', markersize=3)
-phase_data = []
+phase_data = PointBuffer() if phase_length is None else RingBuffer(phase_length)
 
 # Position vs. Angle plot setup
 ax_position_angle.set_xlim(-a - 1, a + 1)
@@ -43,7 +49,7 @@ ax_position_angle.set_ylim(-np.pi, np.pi)  # Angle range in radians
 ax_position_angle.set_xlabel("x-coordinate")
 ax_position_angle.set_ylabel("Angle (radians)")
 position_angle_points, = ax_position_angle.plot([], [], 'go', markersize=1.5)
-position_angle_data = []
+position_angle_data = PointBuffer() if phase_length is None else RingBuffer(phase_length)
 
 # Check if collision occurs
 def check_collision(x, y, a, b):
@@ -72,8 +78,8 @@ def calculate_tangent_velocity(x, y, vx, vy, a, b):
     tangent_velocity = vx * tangent_x + vy * tangent_y
     return np.abs(tangent_velocity)
 
-def ball_movements(frame):
-    global position, velocity
+def step_ball():
+    global position, velocity, bounces
 
     x_0, y_0 = position
     vx, vy = velocity
@@ -95,27 +101,29 @@ def ball_movements(frame):
         y_new = y_0 + vy * step
         velocity = [vx, vy]
         tangent_velocity = calculate_tangent_velocity(x_0, y_0, vx, vy, a, b)
-        phase_data.append((x_0, tangent_velocity))
-        phase_x, phase_y = zip(*phase_data)
-        phase_points.set_data(phase_x, phase_y)
+        phase_data.append(x_0, tangent_velocity)
         angle = np.arctan2(vy, vx)
-        position_angle_data.append((x_new, angle))
-        pa_x, pa_y = zip(*position_angle_data)
-        position_angle_points.set_data(pa_x, pa_y)
-        
+        position_angle_data.append(x_new, angle)
+        bounces += 1
 
     position = [x_new, y_new]
-    trajectory.append((x_new, y_new))
-    trajectory_x, trajectory_y = zip(*trajectory)
-    trajectory_line.set_data(trajectory_x, trajectory_y)
-    ball.set_data([x_new], [y_new])
-
-    # Calculate the angle of the velocity vector
-    # angle = np.arctan2(vy, vx)
-    # position_angle_data.append((x_new, angle))
-    # pa_x, pa_y = zip(*position_angle_data)
-    # position_angle_points.set_data(pa_x, pa_y)
+    trajectory.append(x_new, y_new)
 
+def ball_movements(frame):
+    bounces_before = bounces
+    for _ in range(steps_per_frame):
+        step_ball()
+
+    # The trail is a fixed-size ring buffer, so the trajectory view costs the
+    # same every frame.  The phase data is only copied into the plots on
+    # frames with a new bounce (O(number of bounces kept), which phase_length
+    # caps); the phase artists are returned every frame anyway, because blit
+    # restores the empty background before drawing the returned artists.
+    trajectory_line.set_data(*trajectory.view())
+    ball.set_data([position[0]], [position[1]])
+    if bounces != bounces_before:
+        phase_points.set_data(*phase_data.view())
+        position_angle_points.set_data(*position_angle_data.view())
     return ball, trajectory_line, phase_points, position_angle_points
 
 ani = FuncAnimation(fig, ball_movements, frames=2000, interval=1, blit=True)
@@ -3,11 +3,21 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Ellipse, Circle
 
+from lib.histogram import PhaseHistogram, position_angle
+from lib.steppers import run
+
 a, b = 2, 1
 step = 0.075
 attraction_point = [0.0, 0.0]
 attraction_radius = 0.5
 gravity = 0.0
+stepper = "euler"   # "euler" (fixed steps, reflect after overshooting) or "verlet"/"leapfrog"
+                    # (lib.steppers: adaptive steps up to max_step, exact landing on the ellipse)
+max_step = 0.75
+phase_mode = "points"   # "points" (one marker per bounce and initial condition) or "histogram"
+                        # (all bounces binned into lib.histogram.PhaseHistogram grids, shown with imshow)
+histogram_bins = (400, 200)
+histogram_chunk = 4096  # bounces buffered before they are binned in histogram mode
 
 # List of initial positions and angles
 initial_conditions = [
@@ -30,6 +40,21 @@ ax_position_angle.set_ylim(0, np.pi)  # Angle range in radians
 ax_position_angle.set_xlabel("x-coordinate")
 ax_position_angle.set_ylabel("Angle (radians)")
 
+phase_histogram = PhaseHistogram(histogram_bins, ((-a, a), (0, 1.0)))
+position_angle_histogram = PhaseHistogram(histogram_bins, ((-a - 1, 3 * a + 1), (0, np.pi)))
+
+def bin_points(histogram, points):
+    # Move buffered (u, w) points into the histogram and empty the buffer.
+    if points:
+        histogram.add(*np.array(points).T)
+        points.clear()
+
+def flush_histograms(phase_data, position_angle_data, chunk=0):
+    # In histogram mode keep at most `chunk` bounces in the lists.
+    if phase_mode == "histogram" and len(phase_data) >= chunk:
+        bin_points(phase_histogram, phase_data)
+        bin_points(position_angle_histogram, position_angle_data)
+
 def check_collision(x, y, a, b):
     return (x ** 2 / a ** 2 + y ** 2 / b ** 2) >= 1
 
@@ -63,6 +88,17 @@ for idx, (initial_position, initial_angle) in enumerate(initial_conditions):
     position_angle_data = []
 
     n_reflection = 10000
+    if stepper != "euler":
+        # Same run length as the Euler loop; its kick of `gravity` per step
+        # of `step` is an acceleration gravity / step.
+        bounces, _ = run(position[0], position[1], velocity[0], velocity[1], n_reflection * step, a, b,
+                         attraction_point, attraction_radius, gravity / step, h=max_step, method=stepper)
+        for _, x_hit, y_hit, vx, vy in bounces:
+            phase_data.append((x_hit, calculate_tangent_velocity(x_hit, y_hit, vx, vy, a, b)))
+            position_angle_data.append(position_angle(x_hit, y_hit, vx, vy, a))
+            flush_histograms(phase_data, position_angle_data, histogram_chunk)
+        n_reflection = 0
+
     for _ in range(n_reflection):
         x_0, y_0 = position
         vx, vy = velocity
@@ -91,9 +127,14 @@ for idx, (initial_position, initial_angle) in enumerate(initial_conditions):
                 position_angle_data.append((x_new + 2*a, abs(angle)))
             else:
                 position_angle_data.append((x_new, abs(angle)))
+            flush_histograms(phase_data, position_angle_data, histogram_chunk)
 
         position = [x_new, y_new]
 
+    if phase_mode == "histogram":
+        flush_histograms(phase_data, position_angle_data)
+        continue
+
     if phase_data:
         phase_x, phase_y = zip(*phase_data)
         ax_phase.plot(phase_x, phase_y, 'o', color=colors[idx], markersize=3, label=f'Initial condition {idx + 1}')
@@ -102,8 +143,13 @@ for idx, (initial_position, initial_angle) in enumerate(initial_conditions):
         pa_x, pa_y = zip(*position_angle_data)
         ax_position_angle.plot(pa_x, pa_y, 'o', color=colors[idx], markersize=3, label=f'Initial condition {idx + 1}')
 
-ax_phase.legend()
-ax_position_angle.legend()
+if phase_mode == "histogram":
+    for ax, histogram in ((ax_phase, phase_histogram), (ax_position_angle, position_angle_histogram)):
+        ax.imshow(histogram.density(log=True).T, extent=histogram.extent, origin="lower", aspect="auto",
+                  cmap="viridis")
+else:
+    ax_phase.legend()
+    ax_position_angle.legend()
 
 plt.show()
 
@@ -3,12 +3,17 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.patches import Ellipse, Circle
 
+from lib.quartic import smallest_positive_root
+from lib.integrator import next_event_integrated
+
 # ======================== Parameters =========================
 # Ellipse and attraction field parameters
 a, b = 4, 2                          # Ellipse semi-axes
 attraction_point = [0.0, 0.0]          # Attraction center (origin)
 attraction_radius = 0.5                # Field radius
 gravity = 0.000                        # Gravity magnitude (try 0.0 for no gravity)
+field_mode = "frozen"                  # "frozen" (entry acceleration) or "integrate" (adaptive solver)
+field_rtol = 1e-9                      # Integrator tolerance for field_mode = "integrate"
 
 # Initial state (matching your animation code)
 initial_position = [0.5, -1.5]
@@ -38,13 +43,6 @@ ax_pos_angle.set_title("(x, angle) Events")
 
 # ======================== Helper Functions =========================
 
-def safe_roots(coeffs):
-    """Trim near-zero leading coefficients and compute roots."""
-    coeffs = np.trim_zeros(np.array(coeffs), 'f')
-    if coeffs.size == 0:
-        return np.array([])
-    return np.roots(coeffs)
-
 def is_in_field(x, y):
     """Return True if (x,y) lies inside (or on) the attraction field."""
     return math.hypot(x - attraction_point[0], y - attraction_point[1]) <= attraction_radius
@@ -80,9 +78,7 @@ def solve_accelerated_for_field(x, y, vx, vy, ax, ay, r):
     A1 = 2*(x*vx + y*vy)
     A0 = x**2 + y**2 - r**2
     coeffs = [A4, A3, A2, A1, A0]
-    roots = safe_roots(coeffs)
-    positive = [t.real for t in roots if np.isreal(t) and t.real > 1e-12]
-    return min(positive) if positive else np.inf
+    return smallest_positive_root([coeffs], t_min=1e-12)[0]
 
 def calculate_ellipse_collision(x, y, vx, vy, a, b):
     """
@@ -193,7 +189,11 @@ pos_angle_data = []  # List of (x, angle) events (angle computed from velocity).
 
 n_events = 100
 for _ in range(n_events):
-    t_event, x, y, vx, vy, event_type = next_event(x, y, vx, vy)
+    if field_mode == "integrate":
+        t_event, x, y, vx, vy, event_type = next_event_integrated(
+            x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity, rtol=field_rtol)
+    else:
+        t_event, x, y, vx, vy, event_type = next_event(x, y, vx, vy)
     # Record the state at the event.
     angle = math.atan2(vy, vx)
     pos_angle_data.append((x, angle))
@@ -0,0 +1,237 @@
+from contextlib import contextmanager
+
+import numpy as np
+
+from lib import instrument
+from lib.ensemble import next_event, reflect_off_ellipse, solve_accelerated_for_field, record_events
+from lib.integrator import field_passage, BOUNDARY_TOL
+
+# Tolerance-driven choice of the field solver.
+# All three solvers approximate the same central field (billiards-03.py,
+# lib.integrator): acceleration of magnitude gravity towards the attraction
+# point inside attraction_radius.  Free flight outside the field is exact in
+# every engine; only field passages are approximated:
+#
+#      level 0  "kick"       straight chord through the field plus the impulse
+#                            the field gives along that chord (b.py-style instant
+#                            kick; |dv| = 2 g d asinh(L/d) / |v| towards the point,
+#                            d the impact parameter, L the half chord)
+#      level 1  "frozen"     acceleration frozen at its entry value, quartic
+#                            crossing time (as lib.ensemble.next_event)
+#      level 2  "integrate"  error-controlled integration (lib.integrator)
+#
+# Every passage is checked against the invariants of the exact motion: it
+# must end on the field circle (boundary residual | |r - p| - R | / R) and
+# conserve E = |v|^2/2 + g*min(|r - p|, R) (drift |E1 - E0| / (|v0|^2/2))
+# and, the field being central, the angular momentum (r - p) x v about the
+# point (drift relative to R|v0|).  Passages that leave the ellipse before
+# the field are not approximated at all.
+# A passage starts at the cheapest level and moves up only while it fails
+# the check.  The kick and the frozen field both ignore how the path bends
+# in the field, an error of relative size about
+#
+#      bending = g R / |v|^2                  (R = attraction_radius)
+#
+# so they can only pass when bending <= tol, i.e. for weak fields or fast
+# trajectories (at tol = 1e-8 and g = 1, |v| > 1e4 sqrt(R)).  Rows above that
+# skip them and go straight to the integrator instead of paying for two
+# failed attempts first.
+
+ENGINE_VERSION = "3"   # Bump whenever a change alters the events computed
+LEVEL_EXACT = -1
+SOLVERS = ("kick", "frozen", "integrate")
+
+
+def energy(x, y, vx, vy, attraction_point, attraction_radius, gravity):
+    r = np.hypot(x - attraction_point[0], y - attraction_point[1])
+    return 0.5*(vx**2 + vy**2) + gravity*np.minimum(r, attraction_radius)
+
+
+def angular_momentum(x, y, vx, vy, attraction_point):
+    return (x - attraction_point[0])*vy - (y - attraction_point[1])*vx
+
+
+def passage_check(state0, state1, attraction_point, attraction_radius, gravity):
+    """
+    Errors of the passages state0 -> state1 (tuples (x, y, vx, vy) of
+    arrays): (boundary residual, energy drift, angular momentum drift), all
+    relative.
+    """
+    x1, y1 = state1[0], state1[1]
+    residual = np.abs(np.hypot(x1 - attraction_point[0], y1 - attraction_point[1])
+                      - attraction_radius) / attraction_radius
+    speed2 = state0[2]**2 + state0[3]**2
+    speed2 = np.where(speed2 > 0, speed2, 1.0)
+    e0 = energy(*state0, attraction_point, attraction_radius, gravity)
+    e1 = energy(*state1, attraction_point, attraction_radius, gravity)
+    l0 = angular_momentum(*state0, attraction_point)
+    l1 = angular_momentum(*state1, attraction_point)
+    return (residual, np.abs(e1 - e0) / (0.5*speed2),
+            np.abs(l1 - l0) / (attraction_radius*np.sqrt(speed2)))
+
+
+def bending(vx, vy, attraction_radius, gravity):
+    """g R / |v|^2: relative error scale of the kick and frozen passages."""
+    speed2 = vx**2 + vy**2
+    return np.abs(gravity)*attraction_radius / np.where(speed2 > 0, speed2, np.finfo(float).tiny)
+
+
+def kick_passage(x, y, vx, vy, attraction_point, attraction_radius, gravity):
+    """Impulse approximation of passages entering the field at (x, y): (t, x, y, vx, vy)."""
+    dx, dy = x - attraction_point[0], y - attraction_point[1]
+    speed2 = vx**2 + vy**2
+    speed = np.sqrt(speed2)
+    # Straight chord from the entry point to the exit point.
+    t = np.maximum(-2*(dx*vx + dy*vy) / speed2, 0.0)
+    x1, y1 = x + vx*t, y + vy*t
+    # Closest approach to the point, and the impulse towards it.
+    s = -(dx*vx + dy*vy) / speed2
+    mx, my = dx + vx*s, dy + vy*s
+    d = np.hypot(mx, my)
+    half = np.sqrt(np.maximum(attraction_radius**2 - d**2, 0.0))
+    safe_d = np.where(d > 0, d, 1.0)
+    dv = np.where(d > 0, 2*gravity*d*np.arcsinh(half/safe_d) / speed, 0.0)
+    return t, x1, y1, vx - dv*mx/safe_d, vy - dv*my/safe_d
+
+
+def frozen_passage(x, y, vx, vy, attraction_point, attraction_radius, gravity):
+    """
+    Passages with the acceleration frozen at its value at (x, y), which must
+    be in the field: (t, x, y, vx, vy), t = inf where no exit was found.
+    """
+    dx, dy = attraction_point[0] - x, attraction_point[1] - y
+    r = np.hypot(dx, dy)
+    scale = np.where(r != 0, gravity / np.where(r != 0, r, 1.0), 0.0)
+    ax, ay = dx*scale, dy*scale
+    t = solve_accelerated_for_field(x, y, vx, vy, ax, ay, attraction_point, attraction_radius)
+    tf = np.where(np.isfinite(t), t, 0.0)
+    return t, x + vx*tf + 0.5*ax*tf**2, y + vy*tf + 0.5*ay*tf**2, vx + ax*tf, vy + ay*tf
+
+
+def _in_field(x, y, vx, vy, attraction_point, attraction_radius):
+    # Vectorized lib.integrator.is_inside_field.
+    dx, dy = x - attraction_point[0], y - attraction_point[1]
+    r = np.hypot(dx, dy)
+    on_circle = np.abs(r - attraction_radius) <= BOUNDARY_TOL*attraction_radius
+    return np.where(on_circle, dx*vx + dy*vy < 0, r < attraction_radius), on_circle
+
+
+@contextmanager
+def _timer(probe, solver):
+    if probe is None:
+        yield
+    else:
+        with probe.timer(solver):
+            yield
+
+
+def next_event_adaptive(x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity, tol=1e-8,
+                        rtol=None, atol=None):
+    """
+    Same contract as lib.ensemble.next_event, plus an int8 array with the
+    solver level used per row (LEVEL_EXACT for free flight, else the index
+    into SOLVERS).  rtol/atol of the integrator default to tol-based values.
+    """
+    x, y, vx, vy = (np.array(v, dtype=float).ravel() for v in (x, y, vx, vy))
+    n = x.size
+    t = np.full(n, np.inf)
+    out = [x.copy(), y.copy(), vx.copy(), vy.copy()]
+    hit_ellipse = np.zeros(n, dtype=bool)
+    hit_field = np.zeros(n, dtype=bool)
+    level = np.full(n, LEVEL_EXACT, dtype=np.int8)
+    probe = instrument.active
+
+    inside, on_circle = _in_field(x, y, vx, vy, attraction_point, attraction_radius)
+    passage = inside & (gravity != 0)
+
+    def attempt(rows, solver, lvl):
+        # Store the passages of `rows` that stay on the table and pass the
+        # check; returns the rows that did not.
+        state0 = (x[rows], y[rows], vx[rows], vy[rows])
+        result = solver(*state0, attraction_point, attraction_radius, gravity)
+        residual, energy_drift, momentum_drift = passage_check(
+            state0, result[1:5], attraction_point, attraction_radius, gravity)
+        ok = (np.isfinite(result[0]) & ((result[1]/a)**2 + (result[2]/b)**2 < 1)
+              & (residual <= tol) & (energy_drift <= tol) & (momentum_drift <= tol))
+        if probe is not None:
+            probe.error(f"{SOLVERS[lvl]}_energy_drift", energy_drift)
+            probe.error(f"{SOLVERS[lvl]}_momentum_drift", momentum_drift)
+        done = rows[ok]
+        t[done] = result[0][ok]
+        for k in range(4):
+            out[k][done] = result[k + 1][ok]
+        hit_field[done] = True
+        level[done] = lvl
+        return rows[~ok]
+
+    # Free flight is a straight line in every model.  gravity=0 keeps
+    # next_event from applying the field to points that leave the circle
+    # from just inside it.
+    rows = np.flatnonzero(~passage)
+    if rows.size:
+        result = next_event(x[rows], y[rows], vx[rows], vy[rows], a, b,
+                            attraction_point, attraction_radius, 0.0)
+        t[rows] = result[0]
+        for k in range(4):
+            out[k][rows] = result[k + 1]
+        hit_ellipse[rows], hit_field[rows] = result[5], result[6]
+
+    # Field passages, cheapest solver first.  The kick needs the entry point;
+    # rows whose bending already exceeds tol skip both cheap solvers.
+    todo = np.flatnonzero(passage)
+    cheap = bending(vx[todo], vy[todo], attraction_radius, gravity) <= tol
+    skipped = todo[~cheap]
+    todo = todo[cheap]
+    entering = todo[on_circle[todo]]
+    todo = todo[~on_circle[todo]]
+    with _timer(probe, "kick"):
+        if entering.size:
+            todo = np.concatenate([todo, attempt(entering, kick_passage, 0)])
+    with _timer(probe, "frozen"):
+        if todo.size:
+            todo = attempt(todo, frozen_passage, 1)
+    todo = np.sort(np.concatenate([todo, skipped]))
+
+    rtol = max(1e-2*tol, 1e-13) if rtol is None else rtol
+    atol = 1e-3*rtol if atol is None else atol
+    with _timer(probe, "integrate"):
+        for i in todo:
+            t_i, x_i, y_i, vx_i, vy_i, event_type, _ = field_passage(
+                x[i], y[i], vx[i], vy[i], a, b, attraction_point, attraction_radius, gravity, rtol=rtol, atol=atol)
+            if event_type == "ellipse":
+                vx_i, vy_i = reflect_off_ellipse(x_i, y_i, vx_i, vy_i, a, b)
+            t[i] = t_i
+            out[0][i], out[1][i], out[2][i], out[3][i] = x_i, y_i, vx_i, vy_i
+            hit_ellipse[i] = event_type == "ellipse"
+            hit_field[i] = event_type == "field"
+            level[i] = 2
+    if probe is not None:
+        state1 = tuple(v[todo] for v in out)
+        _, energy_drift, momentum_drift = passage_check(
+            (x[todo], y[todo], vx[todo], vy[todo]), state1, attraction_point, attraction_radius, gravity)
+        probe.error("integrate_energy_drift", energy_drift[hit_field[todo]])
+        probe.error("integrate_momentum_drift", momentum_drift[hit_field[todo]])
+        rows = np.flatnonzero(passage)
+        record_events(probe, out[0][rows], out[1][rows], out[2][rows], out[3][rows], hit_ellipse[rows],
+                       hit_field[rows], a, b, attraction_point, attraction_radius)
+    return (t, *out, hit_ellipse, hit_field, level)
+
+
+def run_adaptive(x, y, vx, vy, n_events, a, b, attraction_point, attraction_radius, gravity, tol=1e-8):
+    """
+    run_ensemble with next_event_adaptive.  Returns the arrays of
+    lib.ensemble.run_ensemble plus "level" (n_events, N).
+    """
+    x, y, vx, vy = (np.array(v, dtype=float).ravel() for v in (x, y, vx, vy))
+    shape = (n_events, x.size)
+    out = {key: np.empty(shape) for key in ("t", "x", "y", "vx", "vy")}
+    out["ellipse"] = np.empty(shape, dtype=bool)
+    out["field"] = np.empty(shape, dtype=bool)
+    out["level"] = np.empty(shape, dtype=np.int8)
+    for i in range(n_events):
+        t, x, y, vx, vy, hit_e, hit_f, level = next_event_adaptive(
+            x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity, tol)
+        out["t"][i], out["x"][i], out["y"][i] = t, x, y
+        out["vx"][i], out["vy"][i] = vx, vy
+        out["ellipse"][i], out["field"][i], out["level"][i] = hit_e, hit_f, level
+    return out
@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+import platform
+import time
+
+import numpy as np
+
+from lib import adaptive
+from lib.adaptive import next_event_adaptive
+from lib.ensemble import initial_state, random_state
+from lib.histogram import PhaseHistogram, position_angle
+from lib.models import MODELS, MODEL_VERSIONS
+from lib.stream import EVENT_DTYPE, EVENT_ELLIPSE, EVENT_FIELD, EVENT_NONE
+
+# Headless batch runs for compute nodes.
+# A scenario file (JSON) describes one run:
+#
+#      {
+#        "table": {"a": 4, "b": 2},
+#        "field": {"point": [0, 0], "radius": 0.5, "gravity": 1.0},
+#        "engine": "frozen",                  frozen / kick / linear / adaptive
+#        "tol": 1e-8,                         adaptive only
+#        "initial_conditions": [[[0.0, 1.5], 1.047], ...]
+#                           or {"random": 1000, "seed": 0},
+#        "n_events": 1000,
+#        "histogram": {"bins": [512, 512]}    optional
+#      }
+#
+# and run_scenario writes into an output directory
+#
+#      events.npy      EVENT_DTYPE (lib.stream), shape (n_events, N); rows of
+#                      trajectories without an event are EVENT_NONE.  Written
+#                      through a memory map, so the run needs no memory for it.
+#      summary.npz     compressed: initial / final states, total time,
+#                      per-trajectory event counts, the position-angle
+#                      histogram of the bounces and, for the adaptive
+#                      engine, the number of passages per solver level
+#      manifest.json   scenario, engine version, array shapes and dtypes,
+#                      run time; removed when a run starts and written
+#                      last, so its presence marks a complete run.
+
+FORMAT_VERSION = 1
+ENGINE_VERSIONS = {**MODEL_VERSIONS, "adaptive": adaptive.ENGINE_VERSION}
+ENGINES = tuple(ENGINE_VERSIONS)
+DEFAULT_BINS = (512, 512)
+
+
+def load_scenario(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def scenario_state(scenario):
+    """(x, y, vx, vy) arrays of the scenario's initial conditions."""
+    table = scenario["table"]
+    initial = scenario["initial_conditions"]
+    if isinstance(initial, dict):
+        rng = np.random.default_rng(initial.get("seed"))
+        return random_state(int(initial["random"]), table["a"], table["b"], rng)
+    return initial_state(initial)
+
+
+def _stepper(scenario):
+    engine = scenario.get("engine", "frozen")
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r} (expected one of {', '.join(ENGINES)})")
+    table, field = scenario["table"], scenario.get("field", {})
+    args = (float(table["a"]), float(table["b"]), tuple(map(float, field.get("point", (0.0, 0.0)))),
+            float(field.get("radius", 0.5)), float(field.get("gravity", 0.0)))
+    if engine == "adaptive":
+        tol = float(scenario.get("tol", 1e-8))
+        return lambda x, y, vx, vy: next_event_adaptive(x, y, vx, vy, *args, tol=tol)
+    step = MODELS[engine]
+    return lambda x, y, vx, vy: step(x, y, vx, vy, *args)
+
+
+def run_scenario(scenario, out_dir, write_events=True, log=None):
+    """
+    Run the scenario (a dict, see above) and write its output files into
+    out_dir.  Returns the manifest dict.
+    """
+    start = time.perf_counter()
+    step = _stepper(scenario)
+    a = float(scenario["table"]["a"])
+    n_events = int(scenario["n_events"])
+    x, y, vx, vy = (np.array(v, dtype=float).ravel() for v in scenario_state(scenario))
+    n = x.size
+    os.makedirs(out_dir, exist_ok=True)
+    # A rerun into the same directory must not leave the old manifest next to
+    # partial data if it dies.
+    try:
+        os.unlink(os.path.join(out_dir, "manifest.json"))
+    except FileNotFoundError:
+        pass
+
+    initial = np.stack([x, y, vx, vy], axis=-1)
+    t_total = np.zeros(n)
+    n_ellipse = np.zeros(n, dtype=np.int64)
+    n_field = np.zeros(n, dtype=np.int64)
+    levels = {}
+    histogram = PhaseHistogram(scenario.get("histogram", {}).get("bins", DEFAULT_BINS),
+                               ((-a, 3*a), (0.0, np.pi)))
+    events = None
+    if write_events:
+        events = np.lib.format.open_memmap(os.path.join(out_dir, "events.npy"), mode="w+",
+                                           dtype=EVENT_DTYPE, shape=(n_events, n))
+    trajectory = np.arange(n, dtype=np.int32)
+
+    for i in range(n_events):
+        t, x, y, vx, vy, hit_e, hit_f, *level = step(x, y, vx, vy)
+        t_total += np.where(np.isfinite(t), t, 0.0)
+        n_ellipse += hit_e
+        n_field += hit_f
+        if level:
+            for value, count in zip(*np.unique(level[0], return_counts=True)):
+                levels[int(value)] = levels.get(int(value), 0) + int(count)
+        if hit_e.any():
+            histogram.add(*position_angle(x[hit_e], y[hit_e], vx[hit_e], vy[hit_e], a))
+        if events is not None:
+            row = events[i]
+            row["trajectory"] = trajectory
+            row["t"], row["x"], row["y"], row["vx"], row["vy"] = t_total, x, y, vx, vy
+            row["event"] = np.where(hit_e, EVENT_ELLIPSE, np.where(hit_f, EVENT_FIELD, EVENT_NONE))
+        if log and (i + 1) % max(1, n_events // 10) == 0:
+            log(f"{i + 1}/{n_events} events")
+    if events is not None:
+        events.flush()
+        del events
+
+    summary = {
+        "initial_state": initial,
+        "final_state": np.stack([x, y, vx, vy], axis=-1),
+        "t": t_total,
+        "n_ellipse": n_ellipse,
+        "n_field": n_field,
+        "histogram": histogram.counts,
+        "histogram_outside": np.int64(histogram.outside),
+        "histogram_range": np.array(histogram.range),
+    }
+    if levels:
+        summary["solver_level"] = np.array(sorted(levels), dtype=np.int8)
+        summary["solver_count"] = np.array([levels[k] for k in sorted(levels)], dtype=np.int64)
+    np.savez_compressed(os.path.join(out_dir, "summary.npz"), **summary)
+
+    files = {"summary.npz": {key: {"shape": list(np.shape(v)), "dtype": np.asarray(v).dtype.str}
+                             for key, v in summary.items()}}
+    if write_events:
+        files["events.npy"] = {"shape": [n_events, n], "dtype": EVENT_DTYPE.descr}
+    engine = scenario.get("engine", "frozen")
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "engine": engine,
+        "engine_version": ENGINE_VERSIONS[engine],
+        "scenario": scenario,
+        "n_trajectories": n,
+        "n_events": n_events,
+        "files": files,
+        "seconds": time.perf_counter() - start,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "machine": {"python": platform.python_version(), "numpy": np.__version__, "node": platform.node()},
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def load_output(out_dir, mmap=True):
+    """(manifest, summary dict, events array or None) of a finished run."""
+    with open(os.path.join(out_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    with np.load(os.path.join(out_dir, "summary.npz")) as data:
+        summary = dict(data)
+    events = None
+    if "events.npy" in manifest["files"]:
+        events = np.load(os.path.join(out_dir, "events.npy"), mmap_mode="r" if mmap else None)
+    return manifest, summary, events
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a billiard scenario headless and write .npy/.npz output.")
+    parser.add_argument("scenario", help="scenario JSON file")
+    parser.add_argument("--out", default=None, help="output directory (default: scenario file name without .json)")
+    parser.add_argument("--engine", choices=ENGINES, default=None, help="override the scenario's engine")
+    parser.add_argument("--events", type=int, default=None, help="override the scenario's n_events")
+    parser.add_argument("--no-events", action="store_true", help="write only the summary, not events.npy")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario)
+    if args.engine:
+        scenario["engine"] = args.engine
+    if args.events is not None:
+        scenario["n_events"] = args.events
+    for key in ("table", "initial_conditions", "n_events"):
+        if key not in scenario:
+            parser.error(f"scenario has no {key!r}")
+    out_dir = args.out or os.path.splitext(args.scenario)[0]
+    try:
+        manifest = run_scenario(scenario, out_dir, write_events=not args.no_events,
+                                log=None if args.quiet else lambda msg: print(msg, flush=True))
+    except ValueError as exc:
+        parser.error(str(exc))
+    print(f"{manifest['n_trajectories']} trajectories x {manifest['n_events']} events "
+          f"in {manifest['seconds']:.2f}s -> {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
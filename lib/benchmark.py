@@ -0,0 +1,263 @@
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from lib.models import MODELS
+from lib.polygon import simulate
+from lib.steppers import run as run_stepper
+
+# Cross-engine benchmarks.
+# Every engine runs headless on the standard scenarios (no field, weak field,
+# strong field) for a range of ensemble sizes N.  Each measurement reports
+# events per second (best of `repeat` runs) and the tracemalloc high-water
+# mark of a separate run, and the whole set is written as JSON.  Comparing
+# against a baseline JSON flags every case that got slower by more than the
+# threshold.
+#
+#      frozen / kick / linear   event engines of billiards-03.py, b.py, b2.py
+#                               (lib.ensemble, lib.models), all N at once
+#      fixed-step               billiards-025.py's own loop (Euler steps of 0.075,
+#                               reflect after overshooting the ellipse), one
+#                               trajectory at a time
+#      steppers                 lib.steppers semi-implicit Euler, step 0.075,
+#                               exact landing on the ellipse, one at a time
+#      polygon                  exact triangle engine (lib.polygon)
+#      pymunk                   matplot_triangle.py's rigid-body stepping,
+#                               skipped when pymunk is not installed
+
+SCENARIOS = {
+    "no-field": {"gravity": 0.0},
+    "weak-field": {"gravity": 0.1},
+    "strong-field": {"gravity": 2.0},
+}
+ELLIPSE = {"a": 4.0, "b": 2.0, "attraction_point": (0.0, 0.0), "attraction_radius": 1.0}
+TRIANGLE = [(0, 0), (1, 0), (0.5, math.sqrt(3)/2)]
+DEFAULT_SIZES = (1, 16, 256, 4096)
+
+
+def _initial(n, a, b, seed=0):
+    # Start points on a ring outside the attraction field, random directions.
+    rng = np.random.default_rng(seed)
+    phi = 2*np.pi*rng.random(n)
+    angle = 2*np.pi*rng.random(n)
+    return 0.7*a*np.cos(phi), 0.7*b*np.sin(phi), np.cos(angle), np.sin(angle)
+
+
+def _event_engine(name):
+    step = MODELS[name]
+
+    def run(n, n_events, gravity):
+        p = ELLIPSE
+        x, y, vx, vy = _initial(n, p["a"], p["b"])
+        events = 0
+        for _ in range(n_events):
+            _, x, y, vx, vy, hit_e, hit_f = step(x, y, vx, vy, p["a"], p["b"], p["attraction_point"],
+                                                 p["attraction_radius"], gravity)
+            events += int(np.count_nonzero(hit_e) + np.count_nonzero(hit_f))
+        return events
+    return run
+
+
+def _fixed_step(n, n_events, gravity, step=0.075):
+    # The stepping loop of billiards-025.py (stepper = "euler"), run for the
+    # same time as _steppers.  Its field kick is a velocity change per step,
+    # so the acceleration gravity becomes a kick of gravity*step.
+    p = ELLIPSE
+    a, b = p["a"], p["b"]
+    m, k = p["attraction_point"]
+    kick = gravity*step
+    x, y, vx, vy = _initial(n, a, b)
+    events = 0
+    for i in range(n):
+        x_0, y_0, vx_0, vy_0 = x[i], y[i], vx[i], vy[i]
+        for _ in range(int(4.0*n_events/step)):
+            x_new, y_new = x_0 + vx_0*step, y_0 + vy_0*step
+            if math.sqrt((x_new - m)**2 + (y_new - k)**2) <= p["attraction_radius"]:
+                down_x, down_y = m - x_new, k - y_new
+                magnitude = np.hypot(down_x, down_y)
+                vx_0 += down_x/magnitude*kick
+                vy_0 += down_y/magnitude*kick
+                x_new, y_new = x_0 + vx_0*step, y_0 + vy_0*step
+            if x_new**2/a**2 + y_new**2/b**2 >= 1:
+                normal_x, normal_y = 2*x_0/a**2, 2*y_0/b**2
+                normal_len = np.sqrt(normal_x**2 + normal_y**2)
+                normal_x, normal_y = normal_x/normal_len, normal_y/normal_len
+                dot = vx_0*normal_x + vy_0*normal_y
+                vx_0, vy_0 = vx_0 - 2*dot*normal_x, vy_0 - 2*dot*normal_y
+                x_new, y_new = x_0 + vx_0*step, y_0 + vy_0*step
+                events += 1
+            x_0, y_0 = x_new, y_new
+    return events
+
+
+def _steppers(n, n_events, gravity):
+    # Run time chosen so a trajectory sees about n_events wall hits (the mean
+    # free path in the 4 x 2 ellipse is pi*area/perimeter ~ 4).
+    p = ELLIPSE
+    x, y, vx, vy = _initial(n, p["a"], p["b"])
+    events = 0
+    for i in range(n):
+        bounces, _ = run_stepper(x[i], y[i], vx[i], vy[i], 4.0*n_events, p["a"], p["b"], p["attraction_point"],
+                                 p["attraction_radius"], gravity, h=0.075, method="euler", adaptive=False)
+        events += len(bounces)
+    return events
+
+
+def _polygon(n, n_events, gravity):
+    rng = np.random.default_rng(0)
+    angle = 2*np.pi*rng.random(n)
+    positions = np.tile([0.5, 0.25], (n, 1))
+    return simulate(TRIANGLE, positions, np.stack([np.cos(angle), np.sin(angle)], axis=1), n_events,
+                    radius=0.05).size
+
+
+def _pymunk(n, n_events, gravity):
+    import pymunk
+
+    events = 0
+    rng = np.random.default_rng(0)
+    for _ in range(n):
+        space = pymunk.Space()
+        for i in range(3):
+            segment = pymunk.Segment(space.static_body, TRIANGLE[i], TRIANGLE[(i + 1) % 3], 0)
+            segment.elasticity = 1.0
+            space.add(segment)
+        body = pymunk.Body(1, pymunk.moment_for_circle(1, 0, 0.05))
+        body.position = 0.5, 0.25
+        angle = 2*np.pi*rng.random()
+        body.velocity = 2*math.cos(angle), 2*math.sin(angle)
+        shape = pymunk.Circle(body, 0.05)
+        shape.elasticity = 1.0
+        space.add(body, shape)
+        hits = [0]
+
+        def count(arbiter, space, data):
+            hits[0] += 1
+            return True
+        space.add_default_collision_handler().post_solve = count
+        while hits[0] < n_events:
+            space.step(0.01)
+        events += hits[0]
+    return events
+
+
+# name: (run(n, n_events, gravity) -> events, scenarios it applies to, vectorized over N)
+ENGINES = {
+    "frozen": (_event_engine("frozen"), tuple(SCENARIOS), True),
+    "kick": (_event_engine("kick"), tuple(SCENARIOS), True),
+    "linear": (_event_engine("linear"), tuple(SCENARIOS), True),
+    "fixed-step": (_fixed_step, tuple(SCENARIOS), False),
+    "steppers": (_steppers, tuple(SCENARIOS), False),
+    "polygon": (_polygon, ("no-field",), True),
+    "pymunk": (_pymunk, ("no-field",), False),
+}
+
+
+def measure(engine, scenario, n, n_events, repeat=3):
+    """One benchmark case as a dict (events, seconds, events_per_second, peak_bytes)."""
+    run, _, _ = ENGINES[engine]
+    gravity = SCENARIOS[scenario]["gravity"]
+    best = math.inf
+    events = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        events = run(n, n_events, gravity)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    run(n, n_events, gravity)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"engine": engine, "scenario": scenario, "n": n, "n_events": n_events, "events": events,
+            "seconds": best, "events_per_second": events / best if best > 0 else math.inf, "peak_bytes": peak}
+
+
+def run_suite(engines=None, sizes=DEFAULT_SIZES, n_events=200, scalar_limit=16, repeat=3, log=None):
+    """
+    Run every engine on its scenarios and sizes; engines that loop over
+    trajectories in Python only run sizes up to scalar_limit.
+    """
+    results = []
+    for engine in engines or ENGINES:
+        _, scenarios, vectorized = ENGINES[engine]
+        for scenario in scenarios:
+            for n in sizes:
+                if not vectorized and n > scalar_limit:
+                    continue
+                try:
+                    result = measure(engine, scenario, n, n_events, repeat)
+                except ImportError as exc:
+                    result = {"engine": engine, "scenario": scenario, "n": n, "skipped": str(exc)}
+                results.append(result)
+                if log:
+                    log(result)
+                if "skipped" in result:
+                    break
+    return {
+        "machine": {"python": platform.python_version(), "numpy": np.__version__,
+                    "platform": platform.platform(), "processor": platform.processor()},
+        "n_events": n_events,
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Cases whose events/s dropped by more than threshold (relative) against
+    the baseline; a list of (case dict, baseline events/s, ratio).
+    """
+    key = lambda r: (r["engine"], r["scenario"], r["n"])
+    base = {key(r): r for r in baseline["results"] if "skipped" not in r}
+    slower = []
+    for r in results["results"]:
+        old = base.get(key(r))
+        if old is None or "skipped" in r:
+            continue
+        ratio = r["events_per_second"] / old["events_per_second"]
+        if ratio < 1 - threshold:
+            slower.append((r, old["events_per_second"], ratio))
+    return slower
+
+
+def _format(result):
+    if "skipped" in result:
+        return f"{result['engine']:>10} {result['scenario']:>12}  skipped ({result['skipped']})"
+    return (f"{result['engine']:>10} {result['scenario']:>12} N={result['n']:<6d} "
+            f"{result['events_per_second']:12.4g} events/s  peak {result['peak_bytes']/2**20:8.2f} MiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the billiard engines.")
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=None)
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES), help="ensemble sizes N")
+    parser.add_argument("--events", type=int, default=200, help="events per trajectory")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per case (best is kept)")
+    parser.add_argument("--scalar-limit", type=int, default=16, help="largest N for per-trajectory engines")
+    parser.add_argument("--out", default="benchmark.json", help="output JSON file")
+    parser.add_argument("--baseline", default=None, help="earlier JSON output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown reported as regression")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.engines, args.sizes, args.events, args.scalar_limit, args.repeat,
+                        log=lambda r: print(_format(r), flush=True))
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"-> {args.out}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        slower = compare(results, baseline, args.threshold)
+        for r, old, ratio in slower:
+            print(f"REGRESSION {r['engine']} {r['scenario']} N={r['n']}: "
+                  f"{r['events_per_second']:.4g} vs {old:.4g} events/s ({ratio:.2f}x)")
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import functools
+
+import numpy as np
+
+from lib.stream import EVENT_ELLIPSE
+
+# Birkhoff coordinates on the ellipse boundary.
+# A bounce point is (x, y) = (a cos phi, b sin phi); its arc length from
+# (a, 0), measured anticlockwise, is the incomplete elliptic integral
+#      s(phi) = int_0^phi sqrt(a^2 sin^2 t + b^2 cos^2 t) dt.
+# s(phi) is tabulated once per (a, b) (LRU-cached across shapes) and looked
+# up by cubic Hermite interpolation, using the exact derivative ds/dphi, in
+# both directions.  p = v·T / |v| is the tangential velocity component.
+
+TABLE_SIZE = 2048        # Panels of the arc-length table over [0, 2pi]
+_GAUSS_X, _GAUSS_W = np.polynomial.legendre.leggauss(8)
+
+
+def _speed(phi, a, b):
+    """ds/dphi."""
+    return np.hypot(a*np.sin(phi), b*np.cos(phi))
+
+
+@functools.lru_cache(maxsize=64)
+def arc_length_table(a, b, n=TABLE_SIZE):
+    """
+    Read-only arrays (phi, s, ds/dphi) on n + 1 equally spaced angles in
+    [0, 2pi]; each panel is integrated with 8-point Gauss-Legendre.
+    """
+    phi = np.linspace(0.0, 2*np.pi, n + 1)
+    h = phi[1] - phi[0]
+    nodes = phi[:-1, None] + 0.5*h*(_GAUSS_X[None, :] + 1)
+    panels = 0.5*h*(_speed(nodes, a, b) @ _GAUSS_W)
+    s = np.concatenate([[0.0], np.cumsum(panels)])
+    ds = _speed(phi, a, b)
+    for arr in (phi, s, ds):
+        arr.setflags(write=False)
+    return phi, s, ds
+
+
+def perimeter(a, b):
+    return arc_length_table(float(a), float(b))[1][-1]
+
+
+def _hermite(t, h, y0, y1, d0, d1):
+    t2, t3 = t*t, t*t*t
+    return ((2*t3 - 3*t2 + 1)*y0 + (t3 - 2*t2 + t)*h*d0
+            + (-2*t3 + 3*t2)*y1 + (t3 - t2)*h*d1)
+
+
+def arc_length(phi, a, b):
+    """Arc length s in [0, perimeter) of the boundary points at eccentric angles phi."""
+    table_phi, table_s, table_ds = arc_length_table(float(a), float(b))
+    n = table_phi.size - 1
+    h = table_phi[1]
+    phi = np.mod(np.asarray(phi, dtype=float), 2*np.pi)
+    i = np.minimum((phi / h).astype(np.int64), n - 1)
+    t = (phi - table_phi[i]) / h
+    s = _hermite(t, h, table_s[i], table_s[i + 1], table_ds[i], table_ds[i + 1])
+    return np.mod(s, table_s[-1])
+
+
+def eccentric_angle(s, a, b):
+    """Inverse of arc_length: the eccentric angle phi of the points at arc lengths s."""
+    table_phi, table_s, table_ds = arc_length_table(float(a), float(b))
+    n = table_phi.size - 1
+    s = np.mod(np.asarray(s, dtype=float), table_s[-1])
+    i = np.clip(np.searchsorted(table_s, s, side="right") - 1, 0, n - 1)
+    h = table_s[i + 1] - table_s[i]
+    t = (s - table_s[i]) / h
+    phi = _hermite(t, h, table_phi[i], table_phi[i + 1], 1/table_ds[i], 1/table_ds[i + 1])
+    # One Newton step on arc_length(phi) = s removes the interpolation error.
+    length = table_s[-1]
+    residual = (arc_length(phi, a, b) - s + 0.5*length) % length - 0.5*length
+    phi = phi - residual / _speed(phi, a, b)
+    return np.mod(phi, 2*np.pi)
+
+
+def point_at_arc_length(s, a, b):
+    """Boundary points (x, y) at arc lengths s."""
+    phi = eccentric_angle(s, a, b)
+    return a*np.cos(phi), b*np.sin(phi)
+
+
+def birkhoff_state(phi, p, a, b, speed=1.0):
+    """State (x, y, vx, vy) on the ellipse at phi leaving with tangential component p."""
+    phi = np.asarray(phi, dtype=float)
+    p = np.clip(np.asarray(p, dtype=float), -1.0, 1.0)
+    x, y = a*np.cos(phi), b*np.sin(phi)
+    tx, ty = -a*np.sin(phi), b*np.cos(phi)
+    t_len = np.hypot(tx, ty)
+    tx, ty = tx/t_len, ty/t_len
+    # Inward normal: tangent rotated by +90 degrees (the boundary is anticlockwise).
+    nx, ny = -ty, tx
+    q = np.sqrt(1 - p**2)
+    return x, y, speed*(p*tx + q*nx), speed*(p*ty + q*ny)
+
+
+def birkhoff_coordinates(x, y, vx, vy, a, b):
+    """(phi, p) of states on the ellipse (inverse of birkhoff_state)."""
+    phi = np.mod(np.arctan2(y/b, x/a), 2*np.pi)
+    tx, ty = -a*np.sin(phi), b*np.cos(phi)
+    t_len = np.hypot(tx, ty)
+    p = (vx*tx + vy*ty) / (t_len*np.hypot(vx, vy))
+    return phi, p
+
+
+def arc_length_coordinates(x, y, vx, vy, a, b):
+    """Birkhoff coordinates (s, p) of states on the ellipse."""
+    phi, p = birkhoff_coordinates(x, y, vx, vy, a, b)
+    return arc_length(phi, a, b), p
+
+
+def event_coordinates(events, a, b):
+    """
+    (s, p) of the ellipse events of an EVENT_DTYPE array (lib.stream);
+    other event types give nan.
+    """
+    s, p = arc_length_coordinates(events["x"], events["y"], events["vx"], events["vy"], a, b)
+    wall = events["event"] == EVENT_ELLIPSE
+    return np.where(wall, s, np.nan), np.where(wall, p, np.nan)
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from lib.ensemble import ENGINE_VERSION, initial_state, run_ensemble
+
+# On-disk result cache for ensemble runs.
+# Results are stored content-addressed: the key is the sha256 of the full
+# parameter set (canonical JSON, floats at full precision) plus the engine
+# version, so a change to either computes and stores a fresh result instead
+# of returning a stale one.  Each entry is one uncompressed .npz; reading it
+# back costs a file read, not a simulation.  Hits refresh the entry's mtime
+# and the directory is trimmed to max_bytes by deleting the least recently
+# used entries first.
+
+DEFAULT_MAX_BYTES = 2**30
+
+
+def default_directory():
+    return os.environ.get("BILLIARDS_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "billiards"))
+
+
+def _canonical(value):
+    if isinstance(value, np.ndarray):
+        return [_canonical(v) for v in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        # repr round-trips, so equal floats give equal keys and any change shows.
+        return repr(float(value))
+    return value
+
+
+def cache_key(params, engine_version=ENGINE_VERSION):
+    """sha256 hex digest of the parameter dict and the engine version."""
+    text = json.dumps({"engine_version": engine_version, "params": _canonical(params)},
+                      sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = default_directory() if directory is None else os.fspath(directory)
+        self.max_bytes = int(max_bytes)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key):
+        """Dict of arrays stored under key, or None."""
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                result = {name: data[name] for name in data.files}
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        os.utime(path)
+        return result
+
+    def put(self, key, arrays):
+        """Store a dict of arrays under key (atomically), then evict down to max_bytes."""
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict(keep=key)
+
+    def entries(self):
+        """(mtime, size, path) of every entry, least recently used first."""
+        out = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                out.append((st.st_mtime, st.st_size, path))
+        return sorted(out)
+
+    @property
+    def nbytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == self.path(keep):
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.unlink(path)
+
+    def get_or_compute(self, params, compute, engine_version=ENGINE_VERSION):
+        """Cached compute() for params; compute returns a dict of arrays."""
+        key = cache_key(params, engine_version)
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.put(key, result)
+        return result
+
+
+def cached_run_ensemble(a, b, gravity, attraction_radius, initial_conditions, n_events,
+                        attraction_point=(0.0, 0.0), cache=None):
+    """
+    lib.ensemble.run_ensemble for ([x, y], angle) initial conditions, served
+    from the cache when the same parameter set was run before.
+    """
+    cache = ResultCache() if cache is None else cache
+    params = {
+        "a": float(a), "b": float(b), "gravity": float(gravity), "attraction_radius": float(attraction_radius),
+        "attraction_point": [float(v) for v in attraction_point],
+        "initial_conditions": [[[float(v) for v in p], float(ang)] for p, ang in initial_conditions],
+        "n_events": int(n_events),
+    }
+
+    def compute():
+        x, y, vx, vy = initial_state(initial_conditions)
+        return run_ensemble(x, y, vx, vy, n_events, a, b, attraction_point, attraction_radius, gravity)
+
+    return cache.get_or_compute(params, compute)
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from lib.ensemble import next_event, random_state
+from lib.histogram import PhaseHistogram, position_angle
+
+# Checkpoint / resume for long chaos runs.
+# A LongRun holds the complete engine state of an ensemble run with the
+# lib.ensemble event engine: every trajectory's (x, y, vx, vy) and elapsed
+# time, the event counters (num_edge / num_field as in b2.py), the
+# accumulated position-angle histogram of the bounces and the state of the
+# random generator that drew the initial conditions.  save() writes it to a
+# temporary file next to the target and renames it over the old checkpoint
+# (os.replace), so a job killed mid-write always leaves the previous complete
+# checkpoint behind.  Events are deterministic and every array is stored at
+# full precision, so a resumed run is bit-identical to an uninterrupted one.
+
+FORMAT_VERSION = 1
+
+
+class LongRun:
+    def __init__(self, x, y, vx, vy, a, b, attraction_point=(0.0, 0.0), attraction_radius=0.5, gravity=0.0,
+                 rng=None, bins=(512, 512), range=None):
+        self.x, self.y, self.vx, self.vy = (np.array(v, dtype=float).ravel() for v in (x, y, vx, vy))
+        self.a, self.b = float(a), float(b)
+        self.attraction_point = (float(attraction_point[0]), float(attraction_point[1]))
+        self.attraction_radius = float(attraction_radius)
+        self.gravity = float(gravity)
+        self.rng = np.random.default_rng() if rng is None else rng
+        n = self.x.size
+        self.t = np.zeros(n)
+        self.num_edge = np.zeros(n, dtype=np.int64)
+        self.num_field = np.zeros(n, dtype=np.int64)
+        self.events_done = 0
+        if range is None:
+            range = ((-self.a, 3*self.a), (0.0, np.pi))
+        self.histogram = PhaseHistogram(bins, range)
+
+    @classmethod
+    def random(cls, n, a, b, seed=None, **kwargs):
+        """n trajectories from uniform random points in the ellipse with uniform random directions."""
+        rng = np.random.default_rng(seed)
+        return cls(*random_state(n, a, b, rng), a, b, rng=rng, **kwargs)
+
+    def advance(self, n_events):
+        """Run n_events more events for every trajectory."""
+        for _ in range(n_events):
+            t, self.x, self.y, self.vx, self.vy, hit_e, hit_f = next_event(
+                self.x, self.y, self.vx, self.vy, self.a, self.b,
+                self.attraction_point, self.attraction_radius, self.gravity)
+            self.t += np.where(np.isfinite(t), t, 0.0)
+            self.num_edge += hit_e
+            self.num_field += hit_f
+            if hit_e.any():
+                self.histogram.add(*position_angle(self.x[hit_e], self.y[hit_e],
+                                                   self.vx[hit_e], self.vy[hit_e], self.a))
+        self.events_done += n_events
+
+    def save(self, path):
+        """Atomically write the full state to path (.npz)."""
+        path = os.fspath(path)
+        arrays = {
+            "format_version": FORMAT_VERSION,
+            "x": self.x, "y": self.y, "vx": self.vx, "vy": self.vy, "t": self.t,
+            "num_edge": self.num_edge, "num_field": self.num_field,
+            "events_done": self.events_done,
+            "params": np.array([self.a, self.b, self.attraction_point[0], self.attraction_point[1],
+                                self.attraction_radius, self.gravity]),
+            "hist_counts": self.histogram.counts, "hist_outside": self.histogram.outside,
+            "hist_range": np.array(self.histogram.range),
+            "rng_state": json.dumps(self.rng.bit_generator.state),
+        }
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                   dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data["format_version"]) != FORMAT_VERSION:
+                raise ValueError(f"unsupported checkpoint format {int(data['format_version'])}")
+            a, b, m, n, radius, gravity = data["params"]
+            state = json.loads(str(data["rng_state"]))
+            rng = np.random.Generator(getattr(np.random, state["bit_generator"])())
+            rng.bit_generator.state = state
+            counts = data["hist_counts"]
+            run = cls(data["x"], data["y"], data["vx"], data["vy"], a, b, (m, n), radius, gravity, rng=rng,
+                      bins=counts.shape, range=data["hist_range"])
+            run.t = data["t"].copy()
+            run.num_edge = data["num_edge"].copy()
+            run.num_field = data["num_field"].copy()
+            run.events_done = int(data["events_done"])
+            run.histogram.counts = counts.copy()
+            run.histogram.outside = int(data["hist_outside"])
+        return run
+
+
+def run_with_checkpoints(run, total_events, path, every=10000):
+    """
+    Advance run until it has done total_events events, saving a checkpoint
+    to path after every `every` events and at the end.
+    """
+    while run.events_done < total_events:
+        run.advance(min(every, total_events - run.events_done))
+        run.save(path)
+    return run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Long ensemble runs with periodic checkpoints.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    start = sub.add_parser("start", help="start a new run from random initial conditions")
+    start.add_argument("checkpoint", help="checkpoint file (.npz)")
+    start.add_argument("--trajectories", type=int, default=1000)
+    start.add_argument("--seed", type=int, default=None)
+    start.add_argument("--a", type=float, default=4.0)
+    start.add_argument("--b", type=float, default=2.0)
+    start.add_argument("--gravity", type=float, default=0.0)
+    start.add_argument("--radius", type=float, default=0.5)
+    start.add_argument("--point", default="0,0", help="attraction point as m,n")
+    resume = sub.add_parser("resume", help="continue the run saved in a checkpoint")
+    resume.add_argument("checkpoint", help="checkpoint file (.npz)")
+    for p in (start, resume):
+        p.add_argument("--events", type=int, required=True, help="total events per trajectory")
+        p.add_argument("--every", type=int, default=10000, help="events between checkpoints")
+    args = parser.parse_args(argv)
+
+    if args.command == "start":
+        m, n = (float(v) for v in args.point.split(","))
+        run = LongRun.random(args.trajectories, args.a, args.b, seed=args.seed,
+                             attraction_point=(m, n), attraction_radius=args.radius, gravity=args.gravity)
+    else:
+        run = LongRun.load(args.checkpoint)
+    run_with_checkpoints(run, args.events, args.checkpoint, args.every)
+    print(f"{run.events_done} events, {int(run.num_edge.sum())} wall / {int(run.num_field.sum())} field"
+          f" -> {args.checkpoint}")
+
+
+if __name__ == "__main__":
+    main()
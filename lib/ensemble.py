@@ -0,0 +1,218 @@
+import time
+
+import numpy as np
+
+from lib import instrument
+from lib.quartic import smallest_positive_root
+
+# Batched version of the event engine in billiards-03.py.
+# Every function takes NumPy arrays of shape (N,) for the state (x, y, vx, vy)
+# and advances all N trajectories at once.  Time values of np.inf mean
+# "no such event".
+
+EPS_T = 1e-12   # Smallest admissible event time (same cut as billiards-03.py)
+ENGINE_VERSION = "2"   # Bump whenever a change alters the events computed (invalidates lib.cache)
+
+
+def initial_state(initial_conditions):
+    """
+    Convert the scripts' list of ([x, y], angle) pairs into state arrays
+    (x, y, vx, vy) with unit speed.
+    """
+    positions = np.array([p for p, _ in initial_conditions], dtype=float).reshape(-1, 2)
+    angles = np.array([ang for _, ang in initial_conditions], dtype=float)
+    return positions[:, 0].copy(), positions[:, 1].copy(), np.cos(angles), np.sin(angles)
+
+
+def random_state(n, a, b, rng):
+    """
+    n states (x, y, vx, vy) from uniform random points in 0.95 times the
+    ellipse with uniform random unit directions, drawn from the Generator rng.
+    """
+    radius = 0.95*np.sqrt(rng.random(n))
+    phi = 2*np.pi*rng.random(n)
+    angle = 2*np.pi*rng.random(n)
+    return a*radius*np.cos(phi), b*radius*np.sin(phi), np.cos(angle), np.sin(angle)
+
+
+def _smallest_positive_quadratic(A, B, C):
+    """
+    Smallest t > EPS_T with A*t^2 + B*t + C = 0, elementwise.
+    Rows with A == 0 or a negative discriminant give np.inf.
+    """
+    A, B, C = np.broadcast_arrays(A, B, C)
+    t = np.full(A.shape, np.inf)
+    disc = B**2 - 4*A*C
+    ok = (A != 0) & (disc >= 0)
+    sq = np.sqrt(np.where(ok, disc, 0.0))
+    denom = np.where(ok, 2*A, 1.0)
+    t1 = (-B - sq) / denom
+    t2 = (-B + sq) / denom
+    t1 = np.where(ok & (t1 > EPS_T), t1, np.inf)
+    t2 = np.where(ok & (t2 > EPS_T), t2, np.inf)
+    np.minimum(t1, t2, out=t)
+    return t
+
+
+def calculate_ellipse_collision(x, y, vx, vy, a, b):
+    """
+    Solve for t > 0 satisfying
+         ((x+vx*t)/a)^2 + ((y+vy*t)/b)^2 = 1
+    for every trajectory.  Returns (t, x_coll, y_coll); rows without a
+    collision have t = np.inf and the collision point is left at (x, y).
+    """
+    A = (vx**2)/(a**2) + (vy**2)/(b**2)
+    B = 2*((x*vx)/(a**2) + (y*vy)/(b**2))
+    C = (x**2)/(a**2) + (y**2)/(b**2) - 1
+    t = _smallest_positive_quadratic(A, B, C)
+    step = np.where(np.isfinite(t), t, 0.0)
+    return t, x + vx*step, y + vy*step
+
+
+def solve_linear_for_field(x, y, vx, vy, attraction_point, r):
+    """
+    Solve for t > 0 (using constant velocity) such that
+       (x + vx*t - m)^2 + (y + vy*t - n)^2 = r^2,
+    with (m, n) the attraction point.
+    """
+    dx = x - attraction_point[0]
+    dy = y - attraction_point[1]
+    A = vx**2 + vy**2
+    B = 2*(dx*vx + dy*vy)
+    C = dx**2 + dy**2 - r**2
+    return _smallest_positive_quadratic(A, B, C)
+
+
+def solve_accelerated_for_field(x, y, vx, vy, ax, ay, attraction_point, r):
+    """
+    Solve for the smallest positive t satisfying
+       [dx + vx*t + 0.5*ax*t^2]^2 + [dy + vy*t + 0.5*ay*t^2]^2 = r^2
+    with (dx, dy) the offset from the attraction point.  Rows with zero
+    acceleration use the linear solution.
+    """
+    x, y, vx, vy, ax, ay = np.broadcast_arrays(x, y, vx, vy, ax, ay)
+    t = solve_linear_for_field(x, y, vx, vy, attraction_point, r)
+    accel = (ax != 0) | (ay != 0)
+    if np.any(accel):
+        dx = x[accel] - attraction_point[0]
+        dy = y[accel] - attraction_point[1]
+        vxa, vya, axa, aya = vx[accel], vy[accel], ax[accel], ay[accel]
+        coeffs = np.stack([
+            0.25*(axa**2 + aya**2),
+            vxa*axa + vya*aya,
+            vxa**2 + vya**2 + dx*axa + dy*aya,
+            2*(dx*vxa + dy*vya),
+            dx**2 + dy**2 - r**2,
+        ], axis=1)
+        t[accel] = smallest_positive_root(coeffs, t_min=EPS_T)
+    return t
+
+
+def reflect_off_ellipse(x, y, vx, vy, a, b):
+    """
+    Reflect the velocities (vx, vy) off the ellipse at the points (x, y):
+         v_new = v - 2(v·n) n,   n = (2x/a^2, 2y/b^2) / |...|.
+    Rows with a vanishing normal are returned unchanged.
+    """
+    n_x = 2*x/(a**2)
+    n_y = 2*y/(b**2)
+    n_norm = np.hypot(n_x, n_y)
+    ok = n_norm != 0
+    n_norm = np.where(ok, n_norm, 1.0)
+    n_x = n_x / n_norm
+    n_y = n_y / n_norm
+    dot = np.where(ok, vx*n_x + vy*n_y, 0.0)
+    return vx - 2*dot*n_x, vy - 2*dot*n_y
+
+
+def field_acceleration(x, y, attraction_point, attraction_radius, gravity):
+    """
+    Acceleration used for a field passage starting at (x, y): magnitude
+    `gravity` towards the attraction point inside the field, zero outside
+    (and exactly at the attraction point).
+    """
+    dx = attraction_point[0] - x
+    dy = attraction_point[1] - y
+    r = np.hypot(dx, dy)
+    inside = (r <= attraction_radius) & (r != 0) & (gravity != 0)
+    scale = np.where(inside, gravity / np.where(r != 0, r, 1.0), 0.0)
+    return dx*scale, dy*scale
+
+
+def next_event(x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity):
+    """
+    Advance every trajectory to its next event (see next_event in
+    billiards-03.py for the single-trajectory version).
+
+    Returns
+       (t_event, x_new, y_new, vx_new, vy_new, hit_ellipse, hit_field)
+    where hit_ellipse / hit_field are boolean masks of the trajectories whose
+    next event is a wall reflection or a field-boundary crossing.  Rows that
+    are in neither mask have no event (t_event = np.inf) and keep their state.
+    """
+    x, y, vx, vy = (np.asarray(v, dtype=float) for v in (x, y, vx, vy))
+    probe = instrument.active
+    if probe is not None:
+        start = time.perf_counter()
+
+    # Candidate 1: ellipse collision (constant velocity).
+    t_ellipse, x_ell, y_ell = calculate_ellipse_collision(x, y, vx, vy, a, b)
+    if probe is not None:
+        split = time.perf_counter()
+        probe.add_time("ellipse_solve", split - start)
+
+    # Candidate 2: field boundary crossing (frozen acceleration inside).
+    ax_use, ay_use = field_acceleration(x, y, attraction_point, attraction_radius, gravity)
+    t_field = solve_accelerated_for_field(x, y, vx, vy, ax_use, ay_use,
+                                          attraction_point, attraction_radius)
+    if probe is not None:
+        probe.add_time("field_solve", time.perf_counter() - split)
+
+    hit_ellipse = np.isfinite(t_ellipse) & (t_ellipse <= t_field)
+    hit_field = np.isfinite(t_field) & ~hit_ellipse
+    t_event = np.where(hit_ellipse, t_ellipse, t_field)
+
+    vx_ref, vy_ref = reflect_off_ellipse(x_ell, y_ell, vx, vy, a, b)
+    tf = np.where(hit_field, t_field, 0.0)
+    x_new = np.where(hit_ellipse, x_ell, x + vx*tf + 0.5*ax_use*tf**2)
+    y_new = np.where(hit_ellipse, y_ell, y + vy*tf + 0.5*ay_use*tf**2)
+    vx_new = np.where(hit_ellipse, vx_ref, vx + ax_use*tf)
+    vy_new = np.where(hit_ellipse, vy_ref, vy + ay_use*tf)
+    if probe is not None:
+        record_events(probe, x_new, y_new, vx_new, vy_new, hit_ellipse, hit_field, a, b,
+                       attraction_point, attraction_radius)
+    return t_event, x_new, y_new, vx_new, vy_new, hit_ellipse, hit_field
+
+
+def record_events(probe, x, y, vx, vy, hit_ellipse, hit_field, a, b, attraction_point, attraction_radius):
+    """
+    Record the event counts and the boundary residuals of the new positions
+    with a lib.instrument probe; a field crossing moving outwards is an exit.
+    """
+    leaving = (x - attraction_point[0])*vx + (y - attraction_point[1])*vy > 0
+    probe.count("ellipse", np.count_nonzero(hit_ellipse))
+    probe.count("field_exit", np.count_nonzero(hit_field & leaving))
+    probe.count("field_entry", np.count_nonzero(hit_field & ~leaving))
+    probe.count("no_root", np.count_nonzero(~hit_ellipse & ~hit_field))
+    probe.error("ellipse_residual", np.abs((x[hit_ellipse]/a)**2 + (y[hit_ellipse]/b)**2 - 1))
+    r = np.hypot(x[hit_field] - attraction_point[0], y[hit_field] - attraction_point[1])
+    probe.error("field_residual", np.abs(r - attraction_radius))
+
+
+def run_ensemble(x, y, vx, vy, n_events, a, b, attraction_point, attraction_radius, gravity):
+    """
+    Run n_events events for every trajectory.  Returns a dict of arrays of
+    shape (n_events, N): "t", "x", "y", "vx", "vy", "ellipse" and "field".
+    """
+    x, y, vx, vy = (np.array(v, dtype=float) for v in (x, y, vx, vy))
+    shape = (n_events, x.size)
+    out = {key: np.empty(shape) for key in ("t", "x", "y", "vx", "vy")}
+    out["ellipse"] = np.empty(shape, dtype=bool)
+    out["field"] = np.empty(shape, dtype=bool)
+    for i in range(n_events):
+        t, x, y, vx, vy, hit_e, hit_f = next_event(
+            x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity)
+        out["t"][i], out["x"][i], out["y"][i] = t, x, y
+        out["vx"][i], out["vy"][i] = vx, vy
+        out["ellipse"][i], out["field"][i] = hit_e, hit_f
+    return out
@@ -0,0 +1,82 @@
+import numpy as np
+
+# Constant-memory accumulation of Poincaré sections.  Bounce events are
+# binned straight into a fixed 2-D count grid instead of being kept as points.
+
+
+def position_angle(x, y, vx, vy, a):
+    """
+    (x, angle) coordinates of the phase plots in b.py / billiards-025.py:
+    bounces on the upper half are shifted to x + 2a and the angle is |atan2|.
+    """
+    angle = np.abs(np.arctan2(vy, vx))
+    return np.where(y > 0, x + 2*a, x), angle
+
+
+class PhaseHistogram:
+    """
+    Fixed-size 2-D histogram of (u, w) points.
+
+    bins is (nu, nw) and range ((u_min, u_max), (w_min, w_max)); points
+    outside the range are only counted in `outside`.  Histograms with the
+    same bins and range can be merged (e.g. partial grids from workers).
+    """
+
+    def __init__(self, bins=(512, 512), range=((-5.0, 5.0), (-np.pi, np.pi))):
+        self.bins = (int(bins[0]), int(bins[1]))
+        self.range = (tuple(map(float, range[0])), tuple(map(float, range[1])))
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        self.outside = 0
+
+    @property
+    def edges(self):
+        (u0, u1), (w0, w1) = self.range
+        return np.linspace(u0, u1, self.bins[0] + 1), np.linspace(w0, w1, self.bins[1] + 1)
+
+    @property
+    def extent(self):
+        """(left, right, bottom, top) for imshow with the u axis horizontal."""
+        (u0, u1), (w0, w1) = self.range
+        return u0, u1, w0, w1
+
+    @property
+    def total(self):
+        return int(self.counts.sum()) + self.outside
+
+    def add(self, u, w):
+        """Bin the points (u, w)."""
+        u = np.asarray(u, dtype=float).ravel()
+        w = np.asarray(w, dtype=float).ravel()
+        (u0, u1), (w0, w1) = self.range
+        iu = np.floor((u - u0) / (u1 - u0) * self.bins[0]).astype(np.int64)
+        iw = np.floor((w - w0) / (w1 - w0) * self.bins[1]).astype(np.int64)
+        # Points exactly on the upper edge go into the last bin.
+        iu[u == u1] = self.bins[0] - 1
+        iw[w == w1] = self.bins[1] - 1
+        inside = (iu >= 0) & (iu < self.bins[0]) & (iw >= 0) & (iw < self.bins[1])
+        self.outside += int(u.size - np.count_nonzero(inside))
+        flat = iu[inside]*self.bins[1] + iw[inside]
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.bins)
+
+    def merge(self, other):
+        """Add the counts of another histogram with the same bins and range."""
+        if other.bins != self.bins or other.range != self.range:
+            raise ValueError("cannot merge histograms with different bins or range")
+        self.counts += other.counts
+        self.outside += other.outside
+        return self
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def density(self, log=False):
+        """
+        Counts normalised to a probability density over the range
+        (log=True returns log10(1 + counts) instead, for display).
+        """
+        if log:
+            return np.log10(1.0 + self.counts)
+        (u0, u1), (w0, w1) = self.range
+        cell = (u1 - u0) * (w1 - w0) / (self.bins[0] * self.bins[1])
+        inside = self.counts.sum()
+        return self.counts / (inside * cell) if inside else np.zeros(self.bins)
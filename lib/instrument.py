@@ -0,0 +1,158 @@
+import math
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# Optional instrumentation of the event engines.
+# Engines read the module attribute `active` once per call and only record
+# anything when it is not None:
+#
+#      probe = instrument.active
+#      if probe is not None:
+#          probe.count("ellipse")
+#
+# so with instrumentation disabled (the default) the cost is one attribute
+# lookup per call.  A Probe collects event counts, wall-clock seconds per
+# event type or solver phase, root-solver statistics (rows, Newton
+# iterations, degenerate polynomials, rows without a root) and running error
+# statistics (count / mean / rms / min / max), and can pass a summary to a
+# sampling hook every `sample_every` events.
+
+EVENT_KINDS = ("ellipse", "field_entry", "field_exit", "no_root")
+
+active = None
+
+
+class Stats:
+    """Running count / sum / sum of squares / min / max of observed values."""
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        value = float(value)
+        self.n += 1
+        self.total += value
+        self.total_sq += value*value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        if values.size:
+            self.n += values.size
+            self.total += float(values.sum())
+            self.total_sq += float(np.dot(values, values))
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+
+    def as_dict(self):
+        if not self.n:
+            return {"n": 0}
+        return {"n": self.n, "mean": self.total/self.n, "rms": math.sqrt(self.total_sq/self.n),
+                "min": self.min, "max": self.max}
+
+
+class Probe:
+    def __init__(self, hook=None, sample_every=1000):
+        self.hook = hook
+        self.sample_every = int(sample_every)
+        self.reset()
+
+    def reset(self):
+        self.counts = dict.fromkeys(EVENT_KINDS, 0)
+        self.seconds = {}
+        self.solver = {"calls": 0, "rows": 0, "iterations": 0, "degenerate": 0, "no_root": 0}
+        self.errors = {}
+        self._next_sample = self.sample_every
+
+    def count(self, kind, n=1):
+        """Count n events of the given kind (see EVENT_KINDS)."""
+        self.counts[kind] = self.counts.get(kind, 0) + int(n)
+        if self.hook is not None and self.events >= self._next_sample:
+            self._next_sample = self.events + self.sample_every
+            self.hook(self.summary())
+
+    def add_time(self, kind, seconds):
+        self.seconds[kind] = self.seconds.get(kind, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, kind):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(kind, time.perf_counter() - start)
+
+    def solve(self, rows=1, iterations=0, degenerate=0, no_root=0):
+        """Record one call of a root solver over `rows` polynomials."""
+        self.solver["calls"] += 1
+        self.solver["rows"] += int(rows)
+        self.solver["iterations"] += int(iterations)
+        self.solver["degenerate"] += int(degenerate)
+        self.solver["no_root"] += int(no_root)
+
+    def error(self, name, value):
+        """Observe one value (or an iterable of values) of the named error."""
+        stats = self.errors.setdefault(name, Stats())
+        if hasattr(value, "__iter__"):
+            stats.add_many(value)
+        else:
+            stats.add(value)
+
+    @property
+    def events(self):
+        return sum(self.counts.values())
+
+    def summary(self):
+        return {
+            "events": self.events,
+            "counts": dict(self.counts),
+            "seconds": dict(self.seconds),
+            "solver": dict(self.solver),
+            "errors": {name: stats.as_dict() for name, stats in self.errors.items()},
+        }
+
+    def report(self):
+        """Human-readable summary."""
+        lines = ["events: " + ", ".join(f"{k} {v}" for k, v in self.counts.items())]
+        if self.seconds:
+            lines.append("seconds: " + ", ".join(f"{k} {v:.3g}" for k, v in self.seconds.items()))
+        if self.solver["calls"]:
+            lines.append("solver: " + ", ".join(f"{k} {v}" for k, v in self.solver.items()))
+        for name, stats in self.errors.items():
+            d = stats.as_dict()
+            if d["n"]:
+                lines.append(f"{name}: n {d['n']}, mean {d['mean']:.3g}, rms {d['rms']:.3g}, max {d['max']:.3g}")
+        return "\n".join(lines)
+
+
+def enable(probe=None, **kwargs):
+    """Install probe (or a new Probe(**kwargs)) as the active one and return it."""
+    global active
+    active = Probe(**kwargs) if probe is None else probe
+    return active
+
+
+def disable():
+    """Stop recording; returns the probe that was active."""
+    global active
+    probe, active = active, None
+    return probe
+
+
+@contextmanager
+def probing(probe=None, **kwargs):
+    """with probing() as probe: ... records everything run inside the block."""
+    global active
+    previous = active
+    probe = enable(probe, **kwargs)
+    try:
+        yield probe
+    finally:
+        active = previous
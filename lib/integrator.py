@@ -0,0 +1,128 @@
+import math
+import numpy as np
+
+# Error-controlled integration of the motion inside the attraction field.
+# Instead of freezing the acceleration at its entry value (billiards-03.py)
+# the equations of motion
+#      x'' = gravity * (p - x) / |p - x|
+# are integrated with an adaptive Runge-Kutta method with dense output, and
+# the field-boundary and ellipse events are located by root bracketing on the
+# dense output (solve_ivp events).  scipy is imported on the first passage,
+# so importing this module (or lib.adaptive) stays cheap.
+
+EPS_T = 1e-12          # Smallest admissible event time
+BOUNDARY_TOL = 1e-9    # Relative distance from the field circle counted as "on" it
+T_MAX = 1e6            # Upper bound for a single field passage
+
+
+def _field_rhs(attraction_point, gravity):
+    m, n = attraction_point
+
+    def rhs(t, s):
+        x, y, vx, vy = s
+        dx, dy = m - x, n - y
+        r = math.hypot(dx, dy)
+        if r == 0:
+            return [vx, vy, 0.0, 0.0]
+        return [vx, vy, gravity*dx/r, gravity*dy/r]
+    return rhs
+
+
+def _events(a, b, attraction_point, attraction_radius):
+    m, n = attraction_point
+
+    def leave_field(t, s):
+        return math.hypot(s[0] - m, s[1] - n) - attraction_radius
+    leave_field.terminal = True
+    leave_field.direction = 1
+
+    def hit_ellipse(t, s):
+        return (s[0]/a)**2 + (s[1]/b)**2 - 1
+    hit_ellipse.terminal = True
+    hit_ellipse.direction = 1
+
+    return [leave_field, hit_ellipse]
+
+
+def is_inside_field(x, y, vx, vy, attraction_point, attraction_radius):
+    """
+    True if the next stretch of motion from (x, y) is inside the field.
+    Points on the field circle count as inside only when moving inwards.
+    """
+    dx = x - attraction_point[0]
+    dy = y - attraction_point[1]
+    r = math.hypot(dx, dy)
+    if abs(r - attraction_radius) <= BOUNDARY_TOL*attraction_radius:
+        return dx*vx + dy*vy < 0
+    return r < attraction_radius
+
+
+def field_passage(x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity,
+                  rtol=1e-9, atol=1e-12, method="DOP853"):
+    """
+    Integrate the motion inside the field starting at (x, y, vx, vy) until
+    the ball leaves the field or reaches the ellipse.
+
+    rtol/atol control the local error: weak fields are crossed in a few
+    large steps, strong fields take only the steps they need.
+
+    Returns (t_event, x_new, y_new, vx_new, vy_new, event_type, sol) where
+    event_type is "field" or "ellipse" and sol is the solve_ivp result
+    (sol.sol is the dense output over the passage, sol.t the accepted steps).
+    The velocity is not reflected for an "ellipse" event.
+    """
+    from scipy.integrate import solve_ivp
+
+    sol = solve_ivp(_field_rhs(attraction_point, gravity), (0.0, T_MAX), [x, y, vx, vy],
+                    method=method, rtol=rtol, atol=atol, dense_output=True,
+                    events=_events(a, b, attraction_point, attraction_radius))
+    t_field, t_ellipse = (t_ev[0] if t_ev.size else np.inf for t_ev in sol.t_events)
+    if not np.isfinite(min(t_field, t_ellipse)):
+        raise RuntimeError(f"field passage did not terminate: {sol.message}")
+    if t_ellipse <= t_field:
+        t_event, event_type, state = t_ellipse, "ellipse", sol.y_events[1][0]
+    else:
+        t_event, event_type, state = t_field, "field", sol.y_events[0][0]
+    x_new, y_new, vx_new, vy_new = state
+    return t_event, x_new, y_new, vx_new, vy_new, event_type, sol
+
+
+def _linear_time(x, y, vx, vy, cx, cy, sx, sy):
+    """Smallest t > EPS_T with ((x+vx*t-cx)/sx)^2 + ((y+vy*t-cy)/sy)^2 = 1."""
+    A = (vx/sx)**2 + (vy/sy)**2
+    B = 2*((x - cx)*vx/sx**2 + (y - cy)*vy/sy**2)
+    C = ((x - cx)/sx)**2 + ((y - cy)/sy)**2 - 1
+    disc = B**2 - 4*A*C
+    if A == 0 or disc < 0:
+        return np.inf
+    sq = math.sqrt(disc)
+    ts = [t for t in ((-B - sq)/(2*A), (-B + sq)/(2*A)) if t > EPS_T]
+    return min(ts) if ts else np.inf
+
+
+def next_event_integrated(x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity,
+                          rtol=1e-9, atol=1e-12):
+    """
+    Same contract as next_event in billiards-03.py, but field passages are
+    integrated with field_passage instead of using a frozen acceleration.
+
+    Returns (t_event, x_new, y_new, vx_new, vy_new, event_type) with
+    event_type "ellipse" (velocity already reflected) or "field".
+    """
+    if gravity != 0 and is_inside_field(x, y, vx, vy, attraction_point, attraction_radius):
+        t, x_new, y_new, vx_new, vy_new, event_type, _ = field_passage(
+            x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity, rtol=rtol, atol=atol)
+    else:
+        # Free flight: straight line to the ellipse or to the field circle.
+        t_ellipse = _linear_time(x, y, vx, vy, 0.0, 0.0, a, b)
+        t_field = _linear_time(x, y, vx, vy, attraction_point[0], attraction_point[1],
+                               attraction_radius, attraction_radius)
+        event_type = "ellipse" if t_ellipse <= t_field else "field"
+        t = min(t_ellipse, t_field)
+        x_new, y_new, vx_new, vy_new = x + vx*t, y + vy*t, vx, vy
+    if event_type == "ellipse":
+        n_x, n_y = 2*x_new/a**2, 2*y_new/b**2
+        n_norm = math.hypot(n_x, n_y)
+        dot = (vx_new*n_x + vy_new*n_y)/n_norm**2
+        vx_new, vy_new = vx_new - 2*dot*n_x, vy_new - 2*dot*n_y
+    return t, x_new, y_new, vx_new, vy_new, event_type
@@ -0,0 +1,84 @@
+import numpy as np
+
+from lib.ensemble import (calculate_ellipse_collision, solve_linear_for_field, reflect_off_ellipse,
+                          next_event, EPS_T, ENGINE_VERSION)
+from lib.quartic import smallest_positive_root
+
+# The field models of the other scripts, batched with the same contract as
+# lib.ensemble.next_event:
+#      (t_event, x_new, y_new, vx_new, vy_new, hit_ellipse, hit_field)
+#
+#      "frozen"  billiards-03.py: constant acceleration of magnitude gravity
+#                towards the attraction point inside the field
+#                (lib.ensemble.next_event).
+#      "kick"    b.py: straight flight; crossing the field circle adds an
+#                instantaneous velocity kick of size gravity towards the point.
+#      "linear"  b2.py: acceleration gravity*(r - p) proportional to the
+#                displacement, frozen at the start of the flight; the field
+#                crossing is the smallest positive root of a quartic.
+
+
+def kick_next_event(x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity):
+    x, y, vx, vy = (np.asarray(v, dtype=float) for v in (x, y, vx, vy))
+    t_ellipse, x_ell, y_ell = calculate_ellipse_collision(x, y, vx, vy, a, b)
+    if gravity == 0:
+        t_field = np.full(x.shape, np.inf)
+    else:
+        t_field = solve_linear_for_field(x, y, vx, vy, attraction_point, attraction_radius)
+    hit_ellipse = np.isfinite(t_ellipse) & (t_ellipse <= t_field)
+    hit_field = np.isfinite(t_field) & ~hit_ellipse
+    t_event = np.where(hit_ellipse, t_ellipse, t_field)
+
+    tf = np.where(hit_field, t_field, 0.0)
+    xf, yf = x + vx*tf, y + vy*tf
+    dx, dy = attraction_point[0] - xf, attraction_point[1] - yf
+    dist = np.hypot(dx, dy)
+    scale = np.where(hit_field & (dist != 0), gravity / np.where(dist != 0, dist, 1.0), 0.0)
+    vx_ref, vy_ref = reflect_off_ellipse(x_ell, y_ell, vx, vy, a, b)
+    x_new = np.where(hit_ellipse, x_ell, xf)
+    y_new = np.where(hit_ellipse, y_ell, yf)
+    vx_new = np.where(hit_ellipse, vx_ref, vx + dx*scale)
+    vy_new = np.where(hit_ellipse, vy_ref, vy + dy*scale)
+    return t_event, x_new, y_new, vx_new, vy_new, hit_ellipse, hit_field
+
+
+def linear_next_event(x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity):
+    x, y, vx, vy = (np.asarray(v, dtype=float) for v in (x, y, vx, vy))
+    t_ellipse, x_ell, y_ell = calculate_ellipse_collision(x, y, vx, vy, a, b)
+
+    cx, cy = x - attraction_point[0], y - attraction_point[1]
+    ax, ay = cx*gravity, cy*gravity
+    coeffs = np.stack([
+        ax**2 + ay**2,
+        2*(ax*vx + ay*vy),
+        2*(ax*cx + ay*cy) + vx**2 + vy**2,
+        2*(vx*cx + vy*cy),
+        cx**2 + cy**2 - attraction_radius**2,
+    ], axis=-1).reshape(-1, 5)
+    t_field = smallest_positive_root(coeffs, t_min=EPS_T).reshape(x.shape)
+
+    hit_ellipse = np.isfinite(t_ellipse) & (t_ellipse <= t_field)
+    hit_field = np.isfinite(t_field) & ~hit_ellipse
+    t_event = np.where(hit_ellipse, t_ellipse, t_field)
+
+    tf = np.where(hit_field, t_field, 0.0)
+    vx_f, vy_f = vx + ax*tf, vy + ay*tf
+    vx_ref, vy_ref = reflect_off_ellipse(x_ell, y_ell, vx, vy, a, b)
+    x_new = np.where(hit_ellipse, x_ell, x + vx_f*tf)
+    y_new = np.where(hit_ellipse, y_ell, y + vy_f*tf)
+    vx_new = np.where(hit_ellipse, vx_ref, vx_f)
+    vy_new = np.where(hit_ellipse, vy_ref, vy_f)
+    return t_event, x_new, y_new, vx_new, vy_new, hit_ellipse, hit_field
+
+
+MODELS = {
+    "frozen": next_event,
+    "kick": kick_next_event,
+    "linear": linear_next_event,
+}
+# Bump a model's version whenever a change alters the events it computes.
+MODEL_VERSIONS = {
+    "frozen": ENGINE_VERSION,
+    "kick": "1",
+    "linear": "2",
+}
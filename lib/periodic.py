@@ -0,0 +1,163 @@
+import numpy as np
+
+from lib.birkhoff import birkhoff_state, birkhoff_coordinates
+from lib.ensemble import next_event
+
+# Periodic orbits of the bounce map, with or without the attraction field.
+# The map acts on Birkhoff-type coordinates (phi, p): phi is the eccentric
+# angle of the bounce point (x, y) = (a cos phi, b sin phi) and p = v·T / |v|
+# the tangential component of the outgoing velocity.  Period-n orbits are
+# found with Newton's method on P^n(z) - z (single shooting, finite-difference
+# Jacobian), and classified by Tr M with the |Tr M| < 2 criterion of
+# proposal.md.
+
+MAX_EVENTS_PER_BOUNCE = 1000
+MARGINAL_TOL = 1e-6     # ||Tr M| - 2| below this is reported as "marginal"
+GRAZING_TOL = 1e-6      # Solutions with 1 - |p| below this graze the wall and are dropped
+
+
+def bounce_map(phi, p, n, a, b, attraction_point, attraction_radius, gravity, speed=1.0):
+    """
+    Apply the bounce map n times (n ellipse reflections, with any field
+    crossings in between).  Returns (phi_n, p_n); trajectories that stop
+    having events give nan.
+    """
+    x, y, vx, vy = birkhoff_state(phi, p, a, b, speed)
+    x, y, vx, vy = (np.array(v, dtype=float).ravel() for v in (x, y, vx, vy))
+    bounces = np.zeros(x.size, dtype=int)
+    lost = np.zeros(x.size, dtype=bool)
+    for _ in range(n * MAX_EVENTS_PER_BOUNCE):
+        running = (bounces < n) & ~lost
+        if not np.any(running):
+            break
+        t, x1, y1, vx1, vy1, hit_e, _ = next_event(
+            x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity)
+        x, y = np.where(running, x1, x), np.where(running, y1, y)
+        vx, vy = np.where(running, vx1, vx), np.where(running, vy1, vy)
+        bounces += running & hit_e
+        lost |= running & ~np.isfinite(t)
+    phi_n, p_n = birkhoff_coordinates(x, y, vx, vy, a, b)
+    bad = lost | (bounces < n)
+    return np.where(bad, np.nan, phi_n), np.where(bad, np.nan, p_n)
+
+
+def _wrap(dphi):
+    return (dphi + np.pi) % (2*np.pi) - np.pi
+
+
+def _residual_and_jacobian(phi, p, n, params, h):
+    """P^n(z) - z and its finite-difference Jacobian, all seeds in one batch."""
+    k = phi.size
+    offsets = np.array([[0, 0], [h, 0], [-h, 0], [0, h], [0, -h]])
+    phis = (phi[None, :] + offsets[:, :1]).ravel()
+    ps = (p[None, :] + offsets[:, 1:]).ravel()
+    phi_n, p_n = bounce_map(phis, ps, n, *params)
+    phi_n, p_n = phi_n.reshape(5, k), p_n.reshape(5, k)
+    res = np.stack([_wrap(phi_n[0] - phi), p_n[0] - p], axis=-1)
+    d_dphi = np.stack([_wrap(phi_n[1] - phi_n[2]), p_n[1] - p_n[2]], axis=-1) / (2*h)
+    d_dp = np.stack([_wrap(phi_n[3] - phi_n[4]), p_n[3] - p_n[4]], axis=-1) / (2*h)
+    jac_map = np.stack([d_dphi, d_dp], axis=-1)
+    return res, jac_map
+
+
+def _minimal_period(phi, p, n, params, tol):
+    period = np.full(phi.size, n)
+    for k in range(n - 1, 0, -1):
+        if n % k:
+            continue
+        phi_k, p_k = bounce_map(phi, p, k, *params)
+        closes = (np.abs(_wrap(phi_k - phi)) < tol) & (np.abs(p_k - p) < tol)
+        period = np.where(closes, k, period)
+    return period
+
+
+def find_periodic_orbits(n, a, b, attraction_point=(0.0, 0.0), attraction_radius=0.5, gravity=0.0,
+                         seeds=None, n_seeds=(32, 15), speed=1.0, tol=1e-10, max_iter=50, h=1e-7):
+    """
+    Find period-n orbits of the bounce map by Newton iteration from a set of
+    seeds (default: an n_seeds grid over phi in [0, 2pi), p in (-1, 1)).
+
+    Returns a list of dicts, one per distinct orbit, with
+       "phi", "p"      the bounce points of one period of the orbit,
+       "trace"         Tr M of the linearised P^n (Birkhoff monodromy matrix),
+       "stability"     "stable" (|Tr M| < 2), "unstable" (|Tr M| > 2) or
+                       "marginal" (|Tr M| = 2 within MARGINAL_TOL, e.g. the
+                       families of orbits of the field-free ellipse),
+       "stable"        stability == "stable",
+       "residual"      |P^n(z) - z| at the solution,
+       "period"        the minimal period (a divisor of n, never 1).
+    Solutions within GRAZING_TOL of p = +-1 are not orbits and are dropped.
+    """
+    params = (a, b, attraction_point, attraction_radius, gravity, speed)
+    if seeds is None:
+        phi0, p0 = np.meshgrid(np.linspace(0, 2*np.pi, n_seeds[0], endpoint=False),
+                               np.linspace(-1, 1, n_seeds[1] + 2)[1:-1], indexing="ij")
+        seeds = (phi0.ravel(), p0.ravel())
+    phi = np.array(seeds[0], dtype=float).ravel()
+    p = np.array(seeds[1], dtype=float).ravel()
+
+    active = np.ones(phi.size, dtype=bool)
+    for _ in range(max_iter):
+        idx = np.where(active)[0]
+        if idx.size == 0:
+            break
+        res, jac_map = _residual_and_jacobian(phi[idx], p[idx], n, params, h)
+        jac = jac_map - np.eye(2)
+        ok = np.isfinite(res).all(axis=1) & np.isfinite(jac).all(axis=(1, 2)) \
+            & (np.abs(np.linalg.det(np.where(np.isfinite(jac), jac, 0.0))) > 1e-14)
+        step = np.zeros_like(res)
+        if np.any(ok):
+            step[ok] = np.linalg.solve(jac[ok], -res[ok][..., None])[..., 0]
+        # Limit the step so Newton does not jump across the phase space.
+        scale = np.minimum(1.0, 0.5 / np.maximum(np.abs(step).max(axis=1), 1e-300))
+        phi[idx] = np.mod(phi[idx] + scale*step[:, 0], 2*np.pi)
+        p[idx] = np.clip(p[idx] + scale*step[:, 1], -1 + 1e-12, 1 - 1e-12)
+        done = ok & (np.abs(step).max(axis=1) < tol)
+        active[idx[done | ~ok]] = False
+        phi[idx[~ok]] = np.nan
+
+    found = np.isfinite(phi)
+    phi, p = phi[found], p[found]
+    if phi.size == 0:
+        return []
+    res, jac_map = _residual_and_jacobian(phi, p, n, params, h)
+    residual = np.abs(res).max(axis=1)
+    # Newton can be clipped onto the grazing edge p = +-1, where the chords
+    # are so short that the residual passes without an actual orbit.
+    good = (residual < np.sqrt(tol)) & (1 - np.abs(p) >= GRAZING_TOL)
+    phi, p, jac_map, residual = phi[good], p[good], jac_map[good], residual[good]
+    if phi.size == 0:
+        return []
+    period = _minimal_period(phi, p, n, params, np.sqrt(tol))
+    # A chord never ends where it started, so period 1 is always spurious.
+    good = period > 1
+    phi, p, jac_map, residual, period = phi[good], p[good], jac_map[good], residual[good], period[good]
+
+    orbits = []
+    for i in range(phi.size):
+        # Orbit points, to recognise the same cycle found from another seed.
+        points_phi, points_p = [phi[i]], [p[i]]
+        for _ in range(period[i] - 1):
+            nphi, np_ = bounce_map(np.array([points_phi[-1]]), np.array([points_p[-1]]), 1, *params)
+            points_phi.append(nphi[0])
+            points_p.append(np_[0])
+        duplicate = any(
+            np.min(np.abs(_wrap(np.array(o["phi"]) - phi[i])) + np.abs(np.array(o["p"]) - p[i])) < np.sqrt(tol)
+            for o in orbits)
+        if duplicate:
+            continue
+        trace = float(np.trace(jac_map[i]))
+        if abs(abs(trace) - 2) < MARGINAL_TOL:
+            stability = "marginal"
+        else:
+            stability = "stable" if abs(trace) < 2 else "unstable"
+        orbits.append({
+            "phi": points_phi,
+            "p": points_p,
+            "trace": trace,
+            "stability": stability,
+            "stable": stability == "stable",
+            "residual": float(residual[i]),
+            "period": int(period[i]),
+        })
+    return orbits
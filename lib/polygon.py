@@ -0,0 +1,179 @@
+import math
+from fractions import Fraction
+
+import numpy as np
+
+# Exact event-driven billiard in a convex polygon (e.g. the triangle of
+# matplot_triangle.py).  Instead of stepping a rigid-body solver with a fixed
+# timestep, the next wall hit of every ball is computed in closed form: the
+# ball centre moves in the polygon shrunk by the ball radius, and each edge
+# is a line n·r = c with inward normal n.
+#
+# The unfolding mode reflects the table instead of the ball: the orbit is a
+# straight line through a chain of mirrored copies of the polygon.  For a
+# rational polygon (all angles pi*m/n) the copies take only finitely many
+# orientations, which `unfolding_group_order` gives.
+
+COLLISION_DTYPE = np.dtype([
+    ("ball", np.int32),
+    ("t", np.float64),
+    ("frame", np.int64),      # frame of a fixed-step run with frame_dt per frame
+    ("x", np.float64),
+    ("y", np.float64),
+    ("vx", np.float64),       # velocity after the collision
+    ("vy", np.float64),
+    ("angle", np.float64),    # degrees in [0, 360), as calculate_angle
+    ("edge", np.int16),
+])
+
+
+def _ccw(vertices):
+    vertices = np.asarray(vertices, dtype=float)
+    x, y = vertices[:, 0], vertices[:, 1]
+    area = 0.5*np.sum(x*np.roll(y, -1) - np.roll(x, -1)*y)
+    return vertices if area > 0 else vertices[::-1]
+
+
+def edge_lines(vertices):
+    """Inward unit normals n (E, 2) and offsets c (E,) with n·r >= c inside (CCW order)."""
+    vertices = _ccw(vertices)
+    d = np.roll(vertices, -1, axis=0) - vertices
+    n = np.stack([-d[:, 1], d[:, 0]], axis=1)
+    n /= np.linalg.norm(n, axis=1)[:, None]
+    return n, np.einsum('ij,ij->i', n, vertices)
+
+
+def inner_polygon(vertices, radius):
+    """
+    Vertices of the region the centre of a ball of the given radius can
+    reach: every edge moved inwards by radius (convex polygons only).
+    """
+    n, c = edge_lines(vertices)
+    c = c + radius
+    n_next, c_next = np.roll(n, -1, axis=0), np.roll(c, -1)
+    det = n[:, 0]*n_next[:, 1] - n[:, 1]*n_next[:, 0]
+    x = (c*n_next[:, 1] - c_next*n[:, 1]) / det
+    y = (n[:, 0]*c_next - n_next[:, 0]*c) / det
+    return np.roll(np.stack([x, y], axis=1), 1, axis=0)
+
+
+def calculate_angle(vx, vy):
+    """Velocity direction in degrees in [0, 360)."""
+    return np.degrees(np.arctan2(vy, vx)) % 360
+
+
+def next_wall_hit(x, y, vx, vy, normals, offsets):
+    """
+    Time and edge index of the next wall hit of every ball (arrays (N,)).
+    Only edges the ball moves towards count, so the edge it was just
+    reflected off is skipped; a ball rounded to just outside an edge it is
+    moving towards hits it at t = 0.
+    """
+    dist = x[:, None]*normals[None, :, 0] + y[:, None]*normals[None, :, 1] - offsets[None, :]
+    approach = vx[:, None]*normals[None, :, 0] + vy[:, None]*normals[None, :, 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(approach < 0, np.maximum(-dist/approach, 0.0), np.inf)
+    edge = np.argmin(t, axis=1)
+    return t[np.arange(t.shape[0]), edge], edge
+
+
+def simulate(vertices, positions, velocities, n_events, radius=0.0, frame_dt=0.01):
+    """
+    Run n_events wall collisions for every ball (positions, velocities:
+    (N, 2) or (2,)) in the convex polygon.  Returns a COLLISION_DTYPE array
+    ordered collision by collision.  `frame` is the frame index a run with
+    timestep frame_dt would report the collision in.
+    """
+    normals, offsets = edge_lines(inner_polygon(vertices, radius) if radius else vertices)
+    pos = np.atleast_2d(np.array(positions, dtype=float))
+    vel = np.atleast_2d(np.array(velocities, dtype=float))
+    x, y, vx, vy = pos[:, 0].copy(), pos[:, 1].copy(), vel[:, 0].copy(), vel[:, 1].copy()
+    n = x.size
+    time = np.zeros(n)
+    out = np.empty((n_events, n), dtype=COLLISION_DTYPE)
+    balls = np.arange(n, dtype=np.int32)
+    for i in range(n_events):
+        t, edge = next_wall_hit(x, y, vx, vy, normals, offsets)
+        x += vx*t
+        y += vy*t
+        time += t
+        nx, ny = normals[edge, 0], normals[edge, 1]
+        dot = vx*nx + vy*ny
+        vx -= 2*dot*nx
+        vy -= 2*dot*ny
+        row = out[i]
+        row["ball"], row["t"], row["frame"] = balls, time, np.floor(time/frame_dt)
+        row["x"], row["y"], row["vx"], row["vy"] = x, y, vx, vy
+        row["angle"] = calculate_angle(vx, vy)
+        row["edge"] = edge
+    return out.ravel()
+
+
+def unfold(vertices, position, velocity, n_events, radius=0.0, frame_dt=0.01):
+    """
+    Unfolding mode for one ball: the orbit is the straight line
+    position + t*velocity through successive mirrored copies of the table.
+    Copy k is the table mapped by the isometry r -> A_k r + b_k.
+
+    Returns a dict with
+       "t"        (n_events,)        collision times,
+       "unfolded" (n_events, 2)      hit points on the straight line,
+       "edges"    (n_events,)        table edge crossed,
+       "maps"     (n_events + 1, 2, 3) the maps [A_k | b_k],
+       "folded"   COLLISION_DTYPE    the collisions mapped back into the
+                                     table (the same record as simulate).
+    """
+    normals, offsets = edge_lines(inner_polygon(vertices, radius) if radius else vertices)
+    p = np.array(position, dtype=float)
+    v = np.array(velocity, dtype=float)
+    a, b = np.eye(2), np.zeros(2)
+    maps = np.empty((n_events + 1, 2, 3))
+    maps[0] = np.hstack([a, b[:, None]])
+    folded = np.empty(n_events, dtype=COLLISION_DTYPE)
+    points = np.empty((n_events, 2))
+    time = 0.0
+    for i in range(n_events):
+        # An isometry maps inward normals to inward normals, so edge e of
+        # the copy is (A n_e) . r = c_e + (A n_e) . b.
+        n_copy = normals @ a.T
+        t, e = next_wall_hit(p[:1], p[1:], v[:1], v[1:], n_copy, offsets + n_copy @ b)
+        t, e = t[0], e[0]
+        p = p + v*t
+        time += t
+        hit = a.T @ (p - b)
+        # Mirror the copy in the crossed edge.
+        n = n_copy[e] / np.hypot(*n_copy[e])
+        c = n @ p
+        mirror = np.eye(2) - 2*np.outer(n, n)
+        a, b = mirror @ a, mirror @ b + 2*c*n
+        maps[i + 1] = np.hstack([a, b[:, None]])
+        vx, vy = a.T @ v
+        points[i] = p
+        folded[i] = (0, time, np.floor(time/frame_dt), hit[0], hit[1], vx, vy, calculate_angle(vx, vy), e)
+    return {"t": folded["t"].copy(), "unfolded": points, "edges": folded["edge"].copy(),
+            "maps": maps, "folded": folded}
+
+
+def interior_angles(vertices):
+    """Interior angles (radians) of a convex polygon, at each vertex in CCW order."""
+    vertices = _ccw(vertices)
+    prev = np.roll(vertices, 1, axis=0) - vertices
+    nxt = np.roll(vertices, -1, axis=0) - vertices
+    cos = np.einsum('ij,ij->i', prev, nxt) / (np.linalg.norm(prev, axis=1)*np.linalg.norm(nxt, axis=1))
+    return np.arccos(np.clip(cos, -1, 1))
+
+
+def unfolding_group_order(vertices, max_denominator=1000, tol=1e-9):
+    """
+    For a rational polygon (every angle pi*m_i/n_i) the mirrored copies take
+    2N orientations with N = lcm(n_i), so a folded orbit has at most 2N
+    velocity directions.  Returns N, or None if some angle is not a rational
+    multiple of pi (up to max_denominator).
+    """
+    order = 1
+    for angle in interior_angles(vertices):
+        frac = Fraction(angle / math.pi).limit_denominator(max_denominator)
+        if abs(float(frac)*math.pi - angle) > tol:
+            return None
+        order = order*frac.denominator // math.gcd(order, frac.denominator)
+    return order
@@ -0,0 +1,244 @@
+import numpy as np
+
+from lib import instrument
+
+# Batched "smallest positive real root" kernel for the field-crossing
+# polynomials (quartic in t, highest power first).  Replaces one np.roots
+# call (companion matrix + eigen-solve) per event with closed-form roots
+# computed for whole coefficient arrays, polished with Newton steps.
+
+EPS_T = 1e-12        # Default cut for admissible roots (t > EPS_T)
+DEGREE_TOL = 1e-14   # Leading coefficients below this (relative) are dropped
+IMAG_TOL = 1e-6      # Candidates with |imag| below this (relative) count as real
+RESIDUAL_TOL = 1e-8  # Polished roots must have a backward error below this
+SUSPECT_IMAG = 1e-3  # Rejected candidates with |imag| below this (relative) trigger the eig retry
+STEP_TOL = 1e-10     # A last Newton step above this (relative) triggers the eig retry
+
+
+def _polyval(coeffs, t):
+    """Horner evaluation of p(t) and p'(t); coeffs (K, 5), t (K, m)."""
+    p = np.zeros_like(t)
+    dp = np.zeros_like(t)
+    for i in range(coeffs.shape[1]):
+        dp = dp*t + p
+        p = p*t + coeffs[:, i:i+1]
+    return p, dp
+
+
+def _backward_error(coeffs, t):
+    """|p(t)| / sum |c_i t^i| (relative residual of a root)."""
+    p, _ = _polyval(coeffs, t)
+    scale, _ = _polyval(np.abs(coeffs), np.abs(t))
+    return np.abs(p) / np.where(scale > 0, scale, 1.0)
+
+
+def _quadratic_roots(a, b, c):
+    """Roots of a*x^2 + b*x + c (complex), cancellation-free form."""
+    disc = (b*b - 4*a*c).astype(complex)
+    sq = np.sqrt(disc)
+    # Choose the sign that avoids cancellation in -b -/+ sqrt(disc).
+    sq = np.where((b.real*sq.real + b.imag*sq.imag) >= 0, sq, -sq)
+    q = -0.5*(b + sq)
+    q_safe = np.where(q != 0, q, 1.0)
+    r1 = np.where(q != 0, q / a, 0.0)
+    r2 = np.where(q != 0, c / q_safe, 0.0)
+    return np.stack([r1, r2], axis=-1)
+
+
+def _cubic_roots(b, c, d):
+    """Roots of the monic cubic x^3 + b*x^2 + c*x + d (Cardano, complex)."""
+    b, c, d = (np.asarray(v, dtype=complex) for v in (b, c, d))
+    p = c - b*b/3
+    q = 2*b**3/27 - b*c/3 + d
+    sq = np.sqrt((q/2)**2 + (p/3)**3)
+    w1 = -q/2 + sq
+    w2 = -q/2 - sq
+    w = np.where(np.abs(w1) >= np.abs(w2), w1, w2)
+    u = w**(1/3)
+    u_safe = np.where(u != 0, u, 1.0)
+    v = np.where(u != 0, -p/(3*u_safe), 0.0)
+    omega = -0.5 + 0.5j*np.sqrt(3)
+    y = np.stack([u + v, omega*u + np.conj(omega)*v, np.conj(omega)*u + omega*v], axis=-1)
+    return y - b[..., None]/3
+
+
+def _quartic_roots(a, b, c, d):
+    """
+    Roots of the monic quartic x^4 + a*x^3 + b*x^2 + c*x + d (Euler's
+    resolvent-cubic form of Ferrari's method, complex arithmetic).
+    """
+    p = b - 3*a*a/8
+    q = c - a*b/2 + a**3/8
+    r = d - a*c/4 + a*a*b/16 - 3*a**4/256
+    z = _cubic_roots(2*p, p*p - 4*r, -q*q)
+    # Take s1, s2 from the two largest resolvent roots so that s3 = -q/(s1*s2)
+    # does not divide two tiny numbers when q ~ 0.
+    z = np.take_along_axis(z, np.argsort(-np.abs(z), axis=1), axis=1)
+    s1 = np.sqrt(z[:, 0])
+    s2 = np.sqrt(z[:, 1])
+    s12 = s1*s2
+    s3 = np.where(np.abs(s12) > 1e-150, -q/np.where(s12 != 0, s12, 1.0), np.sqrt(z[:, 2]))
+    y = 0.5*np.stack([s1 + s2 + s3, s1 - s2 - s3, -s1 + s2 - s3, -s1 - s2 + s3], axis=-1)
+    return y - (a/4)[:, None]
+
+
+def _effective_degree(coeffs):
+    """Degree of every row after dropping negligible leading coefficients."""
+    scale = np.max(np.abs(coeffs), axis=1, keepdims=True)
+    significant = np.abs(coeffs) > DEGREE_TOL*np.where(scale > 0, scale, 1.0)
+    first = np.argmax(significant, axis=1)
+    degree = coeffs.shape[1] - 1 - first
+    return np.where(significant.any(axis=1), degree, -1)
+
+
+def _candidate_roots(coeffs, degree):
+    """All (complex) roots of every row, padded with nan to 4 columns."""
+    k = coeffs.shape[0]
+    roots = np.full((k, 4), np.nan, dtype=complex)
+    for deg in (4, 3, 2, 1):
+        rows = degree == deg
+        if not np.any(rows):
+            continue
+        c = coeffs[rows, 4 - deg:]
+        if deg == 4:
+            roots[rows] = _quartic_roots(*(c[:, i]/c[:, 0] for i in range(1, 5)))
+        elif deg == 3:
+            roots[rows, :3] = _cubic_roots(*(c[:, i]/c[:, 0] for i in range(1, 4)))
+        elif deg == 2:
+            roots[rows, :2] = _quadratic_roots(c[:, 0], c[:, 1], c[:, 2])
+        else:
+            roots[rows, 0] = -c[:, 1]/c[:, 0]
+    return roots
+
+
+def eig_roots(coeffs):
+    """
+    Reference roots via stacked companion-matrix eigenvalues (what np.roots
+    does per row).  Rows are trimmed like safe_roots; padded with nan.
+    """
+    coeffs = np.atleast_2d(np.asarray(coeffs, dtype=float))
+    degree = _effective_degree(coeffs)
+    roots = np.full((coeffs.shape[0], 4), np.nan, dtype=complex)
+    for deg in (4, 3, 2, 1):
+        rows = degree == deg
+        if not np.any(rows):
+            continue
+        c = coeffs[rows, 4 - deg:]
+        comp = np.zeros((c.shape[0], deg, deg))
+        comp[:, 0, :] = -c[:, 1:] / c[:, :1]
+        idx = np.arange(deg - 1)
+        comp[:, idx + 1, idx] = 1.0
+        roots[rows, :deg] = np.linalg.eigvals(comp)
+    return roots
+
+
+def _polished_smallest(coeffs, roots, t_min, newton_steps):
+    """
+    Polish the near-real candidate roots (K, 4) with Newton steps and return
+    the smallest accepted one per row (np.inf if none), the number of Newton
+    iterations done per row and the mask of suspect rows: a candidate
+    t > t_min failed the residual check, was only nearly real (SUSPECT_IMAG)
+    or was still moving after the last Newton step (STEP_TOL).
+    """
+    finite = np.isfinite(roots)
+    relative_imag = np.abs(roots.imag) / (1 + np.abs(roots.real))
+    near_real = finite & (relative_imag <= IMAG_TOL)
+    t = np.where(near_real, roots.real, 0.0)
+    step = np.zeros_like(t)
+    iterations = np.zeros(coeffs.shape[0], dtype=np.int64)
+    for _ in range(newton_steps):
+        p, dp = _polyval(coeffs, t)
+        ok = near_real & (dp != 0)
+        if not np.any(ok):
+            break
+        step = np.where(ok, p/np.where(dp != 0, dp, 1.0), 0.0)
+        t = t - step
+        iterations += ok.any(axis=1)
+
+    admissible = near_real & (t > t_min)
+    accurate = _backward_error(coeffs, t) <= RESIDUAL_TOL
+    accepted = admissible & accurate
+    suspect = ((admissible & ~accurate)
+               | (accepted & (np.abs(step) > STEP_TOL*(1 + np.abs(t))))
+               | (finite & ~near_real & (relative_imag <= SUSPECT_IMAG) & (roots.real > t_min)))
+    return np.where(accepted, t, np.inf).min(axis=1), iterations, suspect.any(axis=1)
+
+
+def smallest_positive_root(coeffs, t_min=EPS_T, newton_steps=3, return_report=False):
+    """
+    Smallest real root t > t_min of every polynomial in coeffs (K, 5),
+    highest power first; np.inf where there is none.
+
+    Degenerate rows (negligible leading coefficients, as safe_roots trims
+    them) fall back to the closed-form cubic / quadratic / linear solution.
+    Near-real closed-form roots are polished with `newton_steps` Newton
+    iterations and rejected if their backward error exceeds RESIDUAL_TOL.
+    Rows that end up without a root or with a suspect candidate (see
+    _polished_smallest) are solved again from the eigenvalues (eig_roots).
+
+    With return_report=True also returns a dict with the accuracy report
+    (see accuracy_report) plus the number of Newton iterations done, summed
+    over the rows.
+    """
+    coeffs = np.atleast_2d(np.asarray(coeffs, dtype=float))
+    if coeffs.shape[1] < 5:
+        coeffs = np.pad(coeffs, ((0, 0), (5 - coeffs.shape[1], 0)))
+    # Normalise rows so tolerances are relative.
+    scale = np.max(np.abs(coeffs), axis=1, keepdims=True)
+    coeffs = coeffs / np.where(scale > 0, scale, 1.0)
+
+    degree = _effective_degree(coeffs)
+    t_best, iterations, suspect = _polished_smallest(coeffs, _candidate_roots(coeffs, degree), t_min,
+                                                      newton_steps)
+    # Weak fields give huge spurious roots (~1/gravity) that dominate the
+    # monic form, and the small entry or exit roots can come out too
+    # inaccurate to converge or pass the residual check, or even complex.
+    # Such rows retry with the companion-matrix eigenvalues, whose root
+    # replaces the closed-form one when there is one.
+    retry = np.isinf(t_best) | suspect
+    if np.any(retry):
+        t_retry, retry_iterations, _ = _polished_smallest(coeffs[retry], eig_roots(coeffs[retry]), t_min,
+                                                          newton_steps)
+        t_best[retry] = np.where(np.isfinite(t_retry), t_retry, t_best[retry])
+        iterations[retry] += retry_iterations
+    probe = instrument.active
+    if probe is not None:
+        probe.solve(rows=t_best.size, iterations=int(iterations.sum()),
+                    degenerate=np.count_nonzero(degree < 4), no_root=np.count_nonzero(np.isinf(t_best)))
+    if not return_report:
+        return t_best
+    report = accuracy_report(coeffs, t_best)
+    report["newton_iterations"] = int(iterations.sum())
+    report["degree_counts"] = {int(d): int(np.sum(degree == d)) for d in np.unique(degree)}
+    return t_best, report
+
+
+def accuracy_report(coeffs, t, reference=False):
+    """
+    Accuracy of roots t (K,) of the polynomials coeffs (K, 5).
+
+    Returns a dict with the maximum / mean relative backward error over the
+    rows that have a root and the number of rows without one.  With
+    reference=True the roots are also compared against the eigen-solve
+    (eig_roots) and "max_reference_diff" and "n_reference_mismatch" (rows
+    where only one of the two methods finds a root) are added.
+    """
+    coeffs = np.atleast_2d(np.asarray(coeffs, dtype=float))
+    t = np.asarray(t, dtype=float)
+    found = np.isfinite(t)
+    err = _backward_error(coeffs[found], t[found, None])[:, 0] if np.any(found) else np.zeros(0)
+    report = {
+        "n": int(t.size),
+        "n_no_root": int(np.sum(~found)),
+        "max_residual": float(err.max()) if err.size else 0.0,
+        "mean_residual": float(err.mean()) if err.size else 0.0,
+    }
+    if reference:
+        ref = eig_roots(coeffs)
+        real = np.isfinite(ref) & (ref.imag == 0) & (ref.real > EPS_T)
+        t_ref = np.where(real, ref.real, np.inf).min(axis=1)
+        both = found & np.isfinite(t_ref)
+        diff = np.abs(t[both] - t_ref[both])
+        report["max_reference_diff"] = float(diff.max()) if diff.size else 0.0
+        report["n_reference_mismatch"] = int(np.sum(found != np.isfinite(t_ref)))
+    return report
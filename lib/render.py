@@ -0,0 +1,99 @@
+import numpy as np
+
+from lib.histogram import PhaseHistogram
+
+# Raster rendering of large phase portraits.  Points are binned per initial
+# condition (one lib.histogram.PhaseHistogram each), shaded, and mixed into
+# one RGBA image, which is saved as PNG or shown with a single imshow instead
+# of plotting every point with 'o' markers.  matplotlib is only imported by
+# the functions that need it.
+
+DEFAULT_COLORS = ['b', 'g', 'r', 'm', 'c', 'y', 'k']
+
+
+def rasterize(u, w, labels=None, n_labels=None, bins=(800, 600), range=((-5.0, 13.0), (0.0, np.pi)),
+              out=None):
+    """
+    Bin the points (u, w) into one lib.histogram.PhaseHistogram per label
+    (bins (nu, nw) over range).  Points outside range or with a label
+    outside [0, n_labels) are dropped.  Returns the list of histograms; pass
+    it back as `out` to accumulate chunk by chunk.
+    """
+    u = np.asarray(u, dtype=float).ravel()
+    w = np.asarray(w, dtype=float).ravel()
+    labels = np.zeros(u.size, dtype=np.int64) if labels is None else np.asarray(labels).ravel()
+    if out is None:
+        if n_labels is None:
+            n_labels = int(labels.max()) + 1 if labels.size else 1
+        out = [PhaseHistogram(bins, range) for _ in np.arange(n_labels)]
+    for label, histogram in enumerate(out):
+        mine = labels == label
+        histogram.add(u[mine], w[mine])
+    return out
+
+
+def _image_counts(histograms):
+    # (n_labels, nw, nu) image layout (row = w, column = u) of PhaseHistograms.
+    if isinstance(histograms, PhaseHistogram):
+        histograms = [histograms]
+    return np.stack([h.counts.T for h in histograms]).astype(float)
+
+
+def _normalize(values, how):
+    if how == "log":
+        values = np.log1p(values)
+    elif how == "eq_hist":
+        nonzero = values[values > 0]
+        if nonzero.size == 0:
+            return np.zeros_like(values, dtype=float)
+        ranks = np.searchsorted(np.sort(nonzero), values, side="right")
+        return np.where(values > 0, ranks / nonzero.size, 0.0)
+    elif how != "linear":
+        raise ValueError(f"unknown shading {how!r}")
+    top = values.max()
+    return values / top if top > 0 else np.zeros_like(values, dtype=float)
+
+
+def shade(histograms, colors=None, how="log", min_alpha=0.15):
+    """
+    Turn per-label histograms (a PhaseHistogram or a list of them, e.g. from
+    rasterize) into an RGBA float image (nw, nu, 4), origin at the bottom.
+
+    The colour of a pixel is the count-weighted mix of the label colours
+    (matplotlib colour specs, DEFAULT_COLORS by default); its opacity is the
+    total count shaded with `how` ("log", "linear" or "eq_hist").  Empty
+    pixels are fully transparent.
+    """
+    from matplotlib.colors import to_rgb
+
+    counts = _image_counts(histograms)
+    colors = DEFAULT_COLORS if colors is None else colors
+    rgb = np.array([to_rgb(colors[i % len(colors)]) for i in range(counts.shape[0])])
+    total = counts.sum(axis=0)
+    image = np.zeros(total.shape + (4,))
+    filled = total > 0
+    image[..., :3] = np.einsum('chw,ck->hwk', counts, rgb) / np.where(filled, total, 1.0)[..., None]
+    image[..., 3] = np.where(filled, min_alpha + (1 - min_alpha)*_normalize(total, how), 0.0)
+    return image
+
+
+def render_phase(u, w, labels=None, colors=None, bins=(800, 600), range=((-5.0, 13.0), (0.0, np.pi)),
+                 how="log"):
+    """rasterize + shade in one call; returns the RGBA image."""
+    n_labels = None if colors is None or labels is None else len(colors)
+    return shade(rasterize(u, w, labels, n_labels, bins, range), colors, how)
+
+
+def save_png(image, path):
+    """Write an RGBA image from shade/render_phase to a PNG file (no display needed)."""
+    from matplotlib.image import imsave
+
+    imsave(path, np.clip(image, 0.0, 1.0), origin="lower")
+
+
+def imshow_overlay(ax, image, range, **kwargs):
+    """Draw the image on a matplotlib axes covering the data range ((u0, u1), (w0, w1))."""
+    (u0, u1), (w0, w1) = range
+    kwargs.setdefault("interpolation", "nearest")
+    kwargs.setdefault("aspect", "auto")
+    return ax.imshow(image, origin="lower", extent=(u0, u1, w0, w1), **kwargs)
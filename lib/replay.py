@@ -0,0 +1,105 @@
+import numpy as np
+
+from lib.polygon import COLLISION_DTYPE, simulate
+
+# Record-then-replay for animations.
+# A run is simulated headless at full speed into two columnar arrays:
+#      frames      FRAME_DTYPE, one row per frame (state after the step),
+#      collisions  COLLISION_DTYPE (lib.polygon), one row per wall hit,
+# which are saved as one .npz.  `play` animates any window of a record; each
+# animation frame only slices views out of the arrays, so a record can be
+# replayed as often and as long as needed.  matplotlib is only imported by
+# `play`.
+
+FRAME_DTYPE = np.dtype([
+    ("frame", np.int64),
+    ("x", np.float64),
+    ("y", np.float64),
+    ("vx", np.float64),
+    ("vy", np.float64),
+])
+
+
+def record_polygon(vertices, position, velocity, n_frames, dt=0.01, radius=0.0, chunk_events=1024):
+    """
+    Headless run of one ball in a convex polygon with the exact engine of
+    lib.polygon, sampled every dt like a fixed-step run: row k of frames is
+    the state at time (k + 1)*dt.  Returns (frames, collisions).
+    """
+    t_end = n_frames*dt
+    x0, y0 = position
+    vx0, vy0 = velocity
+    chunks = []
+    t0 = 0.0
+    pos, vel = (x0, y0), (vx0, vy0)
+    while t0 < t_end:
+        chunk = simulate(vertices, pos, vel, chunk_events, radius=radius, frame_dt=dt)
+        chunk["t"] += t0
+        chunks.append(chunk)
+        last = chunk[-1]
+        t0 = last["t"]
+        pos, vel = (last["x"], last["y"]), (last["vx"], last["vy"])
+    collisions = np.concatenate(chunks) if chunks else np.empty(0, dtype=COLLISION_DTYPE)
+    collisions = collisions[collisions["t"] <= t_end]
+    collisions["frame"] = np.floor(collisions["t"]/dt)
+
+    # Every frame continues in a straight line from the last collision before
+    # it (or from the initial state).
+    t = np.concatenate([[0.0], collisions["t"]])
+    state = {key: np.concatenate([[value], collisions[key]])
+             for key, value in (("x", x0), ("y", y0), ("vx", vx0), ("vy", vy0))}
+    times = (np.arange(n_frames) + 1)*dt
+    i = np.searchsorted(t, times, side="right") - 1
+    frames = np.empty(n_frames, dtype=FRAME_DTYPE)
+    frames["frame"] = np.arange(n_frames)
+    frames["vx"], frames["vy"] = state["vx"][i], state["vy"][i]
+    frames["x"] = state["x"][i] + frames["vx"]*(times - t[i])
+    frames["y"] = state["y"][i] + frames["vy"]*(times - t[i])
+    return frames, collisions
+
+
+def save_record(path, frames, collisions, **meta):
+    """Write a record as .npz; meta values (vertices, dt, ...) are stored as arrays."""
+    np.savez(path, frames=frames, collisions=collisions,
+             **{"meta_" + key: np.asarray(value) for key, value in meta.items()})
+
+
+def load_record(path):
+    """(frames, collisions, meta) of a record written by save_record."""
+    with np.load(path) as data:
+        meta = {key[5:]: data[key] for key in data.files if key.startswith("meta_")}
+        return data["frames"], data["collisions"], meta
+
+
+def play(fig, table_ax, angle_ax, frames, collisions, start=0, stop=None, trail_length=None,
+         interval=10, artists=None, **kwargs):
+    """
+    Animate frames[start:stop] of a record on the given axes: the ball and
+    its trail on table_ax, the collision angles against frame on angle_ax.
+    trail_length=None shows the whole trail since start.  artists can pass
+    existing (ball, trail, angle) Line2D objects to draw into.  Returns the
+    FuncAnimation (keep a reference to it while it plays).
+    """
+    from matplotlib.animation import FuncAnimation
+
+    stop = frames.size if stop is None else min(stop, frames.size)
+    fx, fy = frames["x"], frames["y"]
+    cf, ca = collisions["frame"], collisions["angle"]
+    # Collisions shown by each frame: all up to and including it.
+    shown = np.searchsorted(cf, frames["frame"], side="right")
+    first = np.searchsorted(cf, frames["frame"][start], side="left") if stop > start else 0
+
+    if artists is None:
+        artists = (table_ax.plot([], [], 'bo', markersize=10)[0],
+                   table_ax.plot([], [], 'b-', alpha=0.5)[0],
+                   angle_ax.plot([], [], 'bo', markersize=5)[0])
+    ball, trajectory_line, angleline = artists
+
+    def update(i):
+        lo = start if trail_length is None else max(start, i + 1 - trail_length)
+        ball.set_data(fx[i:i + 1], fy[i:i + 1])
+        trajectory_line.set_data(fx[lo:i + 1], fy[lo:i + 1])
+        angleline.set_data(cf[first:shown[i]], ca[first:shown[i]])
+        return ball, trajectory_line, angleline
+
+    return FuncAnimation(fig, update, frames=range(start, stop), interval=interval, blit=True, **kwargs)
@@ -0,0 +1,152 @@
+import math
+
+from lib.quartic import smallest_positive_root
+
+# Time steppers for the step-by-step engine of billiards-025.py.
+# The ball moves under the central field
+#      x'' = gravity * (p - x) / |p - x|     inside |x - p| <= attraction_radius,
+# (free flight outside) in steps of at most h.  A step that would leave the
+# ellipse is not reflected at the overshot position: the fraction of the step
+# that reaches x^2/a^2 + y^2/b^2 = 1 is solved for exactly (lib.quartic), so
+# the ball is reflected on the boundary with the normal of the hit point.
+#
+# Steppers share the signature step(x, y, vx, vy, h, accel) -> (x, y, vx, vy)
+# with accel(x, y) -> (ax, ay):
+#      "euler"    semi-implicit Euler (kick, then drift), first order,
+#      "verlet"   velocity Verlet (kick-drift-kick leapfrog), second order and
+#                 symplectic, so the energy error stays bounded.
+# With adaptive=True the step shrinks where the field is strong
+# (h <= eta*|v|/gravity) and near the field boundary, where the acceleration
+# jumps, and is h_max elsewhere.
+
+
+def field(attraction_point, attraction_radius, gravity):
+    m, n = attraction_point
+
+    def accel(x, y):
+        dx, dy = m - x, n - y
+        r = math.hypot(dx, dy)
+        if r > attraction_radius or r == 0 or gravity == 0:
+            return 0.0, 0.0
+        return gravity*dx/r, gravity*dy/r
+    return accel
+
+
+def euler_step(x, y, vx, vy, h, accel):
+    ax, ay = accel(x, y)
+    vx += ax*h
+    vy += ay*h
+    return x + vx*h, y + vy*h, vx, vy
+
+
+def verlet_step(x, y, vx, vy, h, accel):
+    ax, ay = accel(x, y)
+    vx += 0.5*ax*h
+    vy += 0.5*ay*h
+    x += vx*h
+    y += vy*h
+    ax, ay = accel(x, y)
+    return x, y, vx + 0.5*ax*h, vy + 0.5*ay*h
+
+
+# name: (step, drift), with position x + v*h + drift*accel(x)*h^2 after a step
+STEPPERS = {
+    "euler": (euler_step, 1.0),
+    "verlet": (verlet_step, 0.5),
+    "leapfrog": (verlet_step, 0.5),
+}
+
+
+def step_size(x, y, vx, vy, h_max, attraction_point, attraction_radius, gravity, eta=0.05, h_min=1e-6):
+    """
+    Step for the state (x, y, vx, vy): h_max in free flight, at most
+    eta*|v|/gravity inside the field, and no longer than it takes to reach
+    the field circle (but at least h_min).
+    """
+    if gravity == 0:
+        return h_max
+    speed = math.hypot(vx, vy)
+    if speed == 0:
+        return h_min
+    h = h_max
+    d = math.hypot(x - attraction_point[0], y - attraction_point[1])
+    if d <= attraction_radius:
+        h = min(h, eta*speed/abs(gravity))
+    return max(min(h, abs(d - attraction_radius)/speed + h_min), h_min)
+
+
+def _outside(x, y, a, b):
+    return x*x/(a*a) + y*y/(b*b) - 1
+
+
+def _linear_root(A, B, C):
+    # Larger root of A s^2 + B s + C (the exit of a chord), cancellation-free.
+    disc = B*B - 4*A*C
+    if A == 0 or disc < 0:
+        return math.inf
+    q = -0.5*(B + math.copysign(math.sqrt(disc), B))
+    return max(q/A, C/q) if q != 0 else 0.0
+
+
+def land_on_ellipse(x, y, vx, vy, h, method, accel, a, b):
+    """
+    For a step of length h from inside the ellipse that ends outside it,
+    the sub-step s in (0, h] that ends on the ellipse.  Within one step the
+    position is x + v*s + drift*accel(x)*s^2, so the crossing is the
+    smallest positive root of a quartic.  Returns (s, x, y, vx, vy).
+    """
+    stepper, drift = STEPPERS[method]
+    ax, ay = accel(x, y)
+    px, py = drift*ax, drift*ay
+    ia, ib = 1/(a*a), 1/(b*b)
+    coeffs = [px*px*ia + py*py*ib,
+              2*(vx*px*ia + vy*py*ib),
+              (vx*vx + 2*x*px)*ia + (vy*vy + 2*y*py)*ib,
+              2*(x*vx*ia + y*vy*ib),
+              _outside(x, y, a, b)]
+    if px == 0 and py == 0:
+        s = _linear_root(coeffs[2], coeffs[3], coeffs[4])
+    else:
+        s = smallest_positive_root([coeffs])[0]
+    # Rounding can push the root just past h; the step did end outside.
+    s = min(s, h) if math.isfinite(s) else h
+    return (s,) + tuple(stepper(x, y, vx, vy, s, accel))
+
+
+def reflect(x, y, vx, vy, a, b):
+    nx, ny = x/(a*a), y/(b*b)
+    norm = math.hypot(nx, ny)
+    nx, ny = nx/norm, ny/norm
+    dot = vx*nx + vy*ny
+    return vx - 2*dot*nx, vy - 2*dot*ny
+
+
+def run(x, y, vx, vy, t_end, a, b, attraction_point, attraction_radius, gravity, h=0.075,
+        method="verlet", adaptive=True, eta=0.05):
+    """
+    Move the ball until time t_end.  Returns (bounces, n_steps) with one
+    (t, x, y, vx, vy) tuple per wall hit, position on the ellipse and
+    velocity after the reflection.
+    """
+    stepper = STEPPERS[method][0]
+    accel = field(attraction_point, attraction_radius, gravity)
+    t = 0.0
+    bounces = []
+    n_steps = 0
+    while t < t_end:
+        dt = step_size(x, y, vx, vy, h, attraction_point, attraction_radius, gravity, eta) if adaptive else h
+        dt = min(dt, t_end - t)
+        state = stepper(x, y, vx, vy, dt, accel)
+        n_steps += 1
+        if _outside(state[0], state[1], a, b) > 0:
+            dt, x, y, vx, vy = land_on_ellipse(x, y, vx, vy, dt, method, accel, a, b)
+            # Pull the hit point onto the ellipse along the radius before
+            # reflecting, so rounding never leaves the ball outside.
+            scale = 1/math.sqrt(_outside(x, y, a, b) + 1)
+            x, y = x*scale, y*scale
+            vx, vy = reflect(x, y, vx, vy, a, b)
+            bounces.append((t + dt, x, y, vx, vy))
+        else:
+            x, y, vx, vy = state
+        t += dt
+    return bounces, n_steps
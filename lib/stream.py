@@ -0,0 +1,108 @@
+import numpy as np
+
+from lib.ensemble import next_event
+
+# Streaming access to the event engine.  iter_events yields chunks of events
+# as structured arrays instead of building lists of tuples, and EventSink
+# collects chunks into one preallocated, growable structured array.
+
+EVENT_NONE = -1
+EVENT_ELLIPSE = 0
+EVENT_FIELD = 1
+
+CHUNK_RECORDS = 2**20   # Records per chunk (EVENT_DTYPE is 45 bytes: ~45 MiB)
+
+EVENT_DTYPE = np.dtype([
+    ("trajectory", np.int32),   # index of the initial condition
+    ("t", np.float64),          # time since the start of the run
+    ("x", np.float64),
+    ("y", np.float64),
+    ("vx", np.float64),
+    ("vy", np.float64),
+    ("event", np.int8),         # EVENT_ELLIPSE or EVENT_FIELD
+])
+
+
+def iter_events(x, y, vx, vy, n_events, a, b, attraction_point, attraction_radius, gravity,
+                chunk_records=CHUNK_RECORDS, t0=None):
+    """
+    Run n_events events for every trajectory and yield them in chunks.
+
+    Each chunk is an EVENT_DTYPE array holding the events of every
+    trajectory for as many event steps as fit in chunk_records records (at
+    least one step), ordered event by event (all trajectories for event k,
+    then event k+1).  Trajectories that have no further event are dropped
+    from the chunks.  t0 optionally gives the starting time of every
+    trajectory (default 0).
+    """
+    x, y, vx, vy = (np.array(v, dtype=float) for v in (x, y, vx, vy))
+    n = x.size
+    t_total = np.zeros(n) if t0 is None else np.array(t0, dtype=float)
+    trajectory = np.arange(n, dtype=np.int32)
+    done = 0
+    while done < n_events:
+        k = min(max(1, chunk_records // n), n_events - done)
+        chunk = np.empty((k, n), dtype=EVENT_DTYPE)
+        for i in range(k):
+            t, x, y, vx, vy, hit_e, hit_f = next_event(
+                x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity)
+            t_total += np.where(np.isfinite(t), t, 0.0)
+            row = chunk[i]
+            row["trajectory"] = trajectory
+            row["t"], row["x"], row["y"], row["vx"], row["vy"] = t_total, x, y, vx, vy
+            row["event"] = np.where(hit_e, EVENT_ELLIPSE, np.where(hit_f, EVENT_FIELD, EVENT_NONE))
+        done += k
+        chunk = chunk.ravel()
+        yield chunk[chunk["event"] != EVENT_NONE]
+
+
+class EventSink:
+    """
+    Preallocated structured array that grows (doubling) as chunks are
+    appended.  `data` is a view of the filled part.
+    """
+
+    def __init__(self, capacity=4096, dtype=EVENT_DTYPE):
+        self._buffer = np.empty(max(int(capacity), 1), dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def data(self):
+        return self._buffer[:self._size]
+
+    @property
+    def capacity(self):
+        return self._buffer.size
+
+    def reserve(self, capacity):
+        """Grow the buffer to hold at least `capacity` records."""
+        if capacity <= self._buffer.size:
+            return
+        new_capacity = self._buffer.size
+        while new_capacity < capacity:
+            new_capacity *= 2
+        buffer = np.empty(new_capacity, dtype=self._buffer.dtype)
+        buffer[:self._size] = self._buffer[:self._size]
+        self._buffer = buffer
+
+    def append(self, chunk):
+        """Copy the records of chunk (structured array) into the sink."""
+        end = self._size + chunk.size
+        self.reserve(end)
+        self._buffer[self._size:end] = chunk
+        self._size = end
+
+    def clear(self):
+        self._size = 0
+
+
+def collect(chunks, sink=None):
+    """Append every chunk of an iter_events stream to sink (a new EventSink by default)."""
+    if sink is None:
+        sink = EventSink()
+    for chunk in chunks:
+        sink.append(chunk)
+    return sink
@@ -0,0 +1,125 @@
+import argparse
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lib.ensemble import run_ensemble
+
+# Parameter sweeps over ellipse shape and attraction field, run headless on a
+# process pool.  Each grid point runs the billiards-03.py event engine
+# (lib.ensemble) for every initial condition, and all points are collected
+# into one indexed result (one row per grid point).
+
+PARAM_DTYPE = np.dtype([
+    ("a", float), ("b", float), ("gravity", float),
+    ("attraction_radius", float), ("attraction_x", float), ("attraction_y", float),
+])
+
+# Initial conditions relative to the semi-axes: ((u, v), angle) starts at
+# (u*a, v*b), so they stay inside the ellipse for every shape in the grid.
+# These are the initial conditions of b2.py for a, b = 4, 2.
+DEFAULT_INITIAL_CONDITIONS = [
+    ([0.0, 0.75], np.pi / 3),
+    ([0.375, 0.25], np.pi / 4),
+    ([-0.375, 0.25], np.pi / 6),
+    ([0.125, -0.75], 2 * np.pi / 3),
+]
+
+
+def parameter_grid(a_values, b_values, gravity_values, radius_values, point_values=((0.0, 0.0),)):
+    """Structured array (PARAM_DTYPE) with every combination of the given values."""
+    combos = itertools.product(a_values, b_values, gravity_values, radius_values, point_values)
+    return np.array([(a, b, g, r, p[0], p[1]) for a, b, g, r, p in combos], dtype=PARAM_DTYPE)
+
+
+def run_point(params, initial_conditions, n_events, keep_events=False):
+    """
+    Run one grid point (a PARAM_DTYPE record or dict).  Returns a dict with
+    the event counts, the final states and, with keep_events, the full event
+    arrays of lib.ensemble.run_ensemble.
+    """
+    a, b = params["a"], params["b"]
+    rel = np.array([p for p, _ in initial_conditions], dtype=float).reshape(-1, 2)
+    angles = np.array([ang for _, ang in initial_conditions], dtype=float)
+    out = run_ensemble(rel[:, 0]*a, rel[:, 1]*b, np.cos(angles), np.sin(angles), n_events,
+                       a, b, (params["attraction_x"], params["attraction_y"]),
+                       params["attraction_radius"], params["gravity"])
+    result = {
+        "n_ellipse": out["ellipse"].sum(axis=0),
+        "n_field": out["field"].sum(axis=0),
+        "final_state": np.stack([out[k][-1] for k in ("x", "y", "vx", "vy")], axis=-1),
+    }
+    if keep_events:
+        result.update(out)
+    return result
+
+
+def _run_task(task):
+    index, params, initial_conditions, n_events, keep_events = task
+    return index, run_point(params, initial_conditions, n_events, keep_events)
+
+
+def sweep(params, initial_conditions=DEFAULT_INITIAL_CONDITIONS, n_events=1000,
+          processes=None, keep_events=False, chunksize=1):
+    """
+    Run every row of params (see parameter_grid) on a process pool.
+
+    Returns a dict whose arrays are indexed by grid point along axis 0:
+    "params", "n_ellipse" / "n_field" (P, N), "final_state" (P, N, 4) and,
+    with keep_events, the event arrays (P, n_events, N).
+    """
+    params = np.asarray(params, dtype=PARAM_DTYPE)
+    tasks = [(i, params[i], initial_conditions, n_events, keep_events) for i in range(params.size)]
+    results = [None] * params.size
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for index, result in pool.map(_run_task, tasks, chunksize=chunksize):
+            results[index] = result
+    combined = {"params": params}
+    for key in (results[0] if results else ()):
+        combined[key] = np.stack([r[key] for r in results])
+    return combined
+
+
+def _parse_values(tokens):
+    """Floats, or start:stop:num ranges (inclusive linspace)."""
+    values = []
+    for token in tokens:
+        if ":" in token:
+            start, stop, num = token.split(":")
+            values.extend(np.linspace(float(start), float(stop), int(num)))
+        else:
+            values.append(float(token))
+    return values
+
+
+def _parse_point(token):
+    m, n = token.split(",")
+    return float(m), float(n)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sweep the ellipse + attraction field billiard over a parameter grid.")
+    parser.add_argument("--a", nargs="+", default=["4"], help="semi-axis a values (or start:stop:num)")
+    parser.add_argument("--b", nargs="+", default=["2"], help="semi-axis b values (or start:stop:num)")
+    parser.add_argument("--gravity", nargs="+", default=["0"], help="gravity values (or start:stop:num)")
+    parser.add_argument("--radius", nargs="+", default=["0.5"], help="attraction radius values (or start:stop:num)")
+    parser.add_argument("--point", nargs="+", default=["0,0"], help="attraction points as m,n")
+    parser.add_argument("--events", type=int, default=1000, help="events per trajectory")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--keep-events", action="store_true", help="store the full event arrays")
+    parser.add_argument("--out", default="sweep.npz", help="output .npz file")
+    args = parser.parse_args(argv)
+
+    params = parameter_grid(_parse_values(args.a), _parse_values(args.b), _parse_values(args.gravity),
+                            _parse_values(args.radius), [_parse_point(p) for p in args.point])
+    result = sweep(params, n_events=args.events, processes=args.processes,
+                   keep_events=args.keep_events, chunksize=max(1, math.ceil(params.size / 64)))
+    np.savez(args.out, **result)
+    print(f"{params.size} parameter points -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
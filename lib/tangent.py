@@ -0,0 +1,148 @@
+import numpy as np
+
+from lib.ensemble import next_event, field_acceleration
+
+# Tangent-map propagation for the ensemble event engine.
+# Every trajectory carries a 4x4 matrix M = d(x, y, vx, vy)_n / d(x, y, vx, vy)_0
+# built from the exact Jacobian of each event (ellipse reflection or field
+# crossing with frozen acceleration).  Periodic QR renormalisation gives the
+# Lyapunov spectrum.
+
+
+def _ellipse_jacobian(t, qx, qy, vx, vy, a, b):
+    """Jacobian of (r, v) -> (q, v') for a straight flight to the ellipse and a reflection."""
+    n = t.size
+    eye = np.broadcast_to(np.eye(2), (n, 2, 2))
+    v = np.stack([vx, vy], axis=-1)
+    g = np.stack([2*qx/a**2, 2*qy/b**2], axis=-1)
+    g_norm = np.linalg.norm(g, axis=-1)
+    normal = g / g_norm[:, None]
+
+    # dq/ds before the time correction: [I, t I]
+    base = np.concatenate([eye, t[:, None, None]*eye], axis=2)
+    dt = -np.einsum('ni,nij->nj', g, base) / np.einsum('ni,ni->n', g, v)[:, None]
+    dq = base + v[:, :, None]*dt[:, None, :]
+
+    hess = np.array([2/a**2, 2/b**2])
+    proj = eye - normal[:, :, None]*normal[:, None, :]
+    dn = np.einsum('nij,njk->nik', proj, hess[None, :, None]*dq) / g_norm[:, None, None]
+
+    dv = np.concatenate([np.zeros((n, 2, 2)), eye], axis=2)
+    v_dot_n = np.einsum('ni,ni->n', v, normal)
+    dv_new = (dv
+              - 2*normal[:, :, None]*np.einsum('ni,nij->nj', normal, dv)[:, None, :]
+              - 2*normal[:, :, None]*np.einsum('ni,nij->nj', v, dn)[:, None, :]
+              - 2*v_dot_n[:, None, None]*dn)
+    return np.concatenate([dq, dv_new], axis=1)
+
+
+def _field_jacobian(t, x, y, qx, qy, wx, wy, ax, ay, attraction_point, gravity):
+    """
+    Jacobian of (r, v) -> (q, w) for a field-boundary crossing with the
+    acceleration A(r) frozen at the start point.
+    """
+    n = t.size
+    eye = np.broadcast_to(np.eye(2), (n, 2, 2))
+    acc = np.stack([ax, ay], axis=-1)
+    w = np.stack([wx, wy], axis=-1)
+
+    # dA/dr = -gravity (I - u u^T) / rho inside the field, 0 where A = 0.
+    d = np.stack([attraction_point[0] - x, attraction_point[1] - y], axis=-1)
+    rho = np.linalg.norm(d, axis=-1)
+    active = (ax != 0) | (ay != 0)
+    safe_rho = np.where(active, rho, 1.0)
+    u = d / safe_rho[:, None]
+    jac_acc = -gravity*(eye - u[:, :, None]*u[:, None, :]) / safe_rho[:, None, None]
+    jac_acc = np.where(active[:, None, None], jac_acc, 0.0)
+
+    base = np.concatenate([eye + 0.5*t[:, None, None]**2*jac_acc, t[:, None, None]*eye], axis=2)
+    grad = np.stack([qx - attraction_point[0], qy - attraction_point[1]], axis=-1)
+    dt = -np.einsum('ni,nij->nj', grad, base) / np.einsum('ni,ni->n', grad, w)[:, None]
+    dq = base + w[:, :, None]*dt[:, None, :]
+    dw = (np.concatenate([t[:, None, None]*jac_acc, eye], axis=2)
+          + acc[:, :, None]*dt[:, None, :])
+    return np.concatenate([dq, dw], axis=1)
+
+
+def event_jacobian(x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity):
+    """
+    Advance every trajectory by one event and return
+       (t_event, x, y, vx, vy, hit_ellipse, hit_field, J)
+    with J (N, 4, 4) the Jacobian of the event map at the old state.
+    Trajectories without an event get the identity.
+    """
+    x, y, vx, vy = (np.asarray(v, dtype=float) for v in (x, y, vx, vy))
+    t, x_new, y_new, vx_new, vy_new, hit_e, hit_f = next_event(
+        x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity)
+    jac = np.broadcast_to(np.eye(4), (x.size, 4, 4)).copy()
+    if np.any(hit_e):
+        jac[hit_e] = _ellipse_jacobian(t[hit_e], x_new[hit_e], y_new[hit_e],
+                                       vx[hit_e], vy[hit_e], a, b)
+    if np.any(hit_f):
+        ax, ay = field_acceleration(x[hit_f], y[hit_f], attraction_point, attraction_radius, gravity)
+        jac[hit_f] = _field_jacobian(t[hit_f], x[hit_f], y[hit_f], x_new[hit_f], y_new[hit_f],
+                                     vx_new[hit_f], vy_new[hit_f], ax, ay, attraction_point, gravity)
+    return t, x_new, y_new, vx_new, vy_new, hit_e, hit_f, jac
+
+
+def propagate(x, y, vx, vy, n_events, a, b, attraction_point, attraction_radius, gravity):
+    """
+    Run n_events events and return the final state and the tangent matrices
+    M (N, 4, 4) of the whole run (no renormalisation; use lyapunov for long
+    runs).  Returns (x, y, vx, vy, M).
+    """
+    x, y, vx, vy = (np.array(v, dtype=float) for v in (x, y, vx, vy))
+    mono = np.broadcast_to(np.eye(4), (x.size, 4, 4)).copy()
+    for _ in range(n_events):
+        _, x, y, vx, vy, _, _, jac = event_jacobian(
+            x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity)
+        mono = jac @ mono
+    return x, y, vx, vy, mono
+
+
+def reduced_trace(mono):
+    """
+    Trace of the 2x2 (Birkhoff) part of the monodromy matrix of a periodic
+    orbit started on an event.  The flow direction is projected onto the
+    event surface (eigenvalue 0) and the speed scaling has eigenvalue 1, so
+    Tr M_2 = Tr M_4 - 1.  |Tr M_2| < 2 means stable.  With a field the speed
+    eigenvalue is only approximately 1 (the frozen acceleration does not
+    scale with the speed).
+    """
+    return np.trace(mono, axis1=-2, axis2=-1) - 1
+
+
+def lyapunov(x, y, vx, vy, n_events, a, b, attraction_point, attraction_radius, gravity,
+             renormalize_every=10):
+    """
+    Lyapunov spectrum of every trajectory from the tangent map with QR
+    renormalisation every `renormalize_every` events.
+
+    Returns a dict with
+       "per_event"   (N, 4)  exponents per bounce-map event (asymptotic estimate),
+       "per_time"    (N, 4)  exponents per unit time,
+       "finite_time" (K, N)  running estimate of the largest per-event exponent
+                             after each renormalisation,
+       "state"       (4, N)  final (x, y, vx, vy).
+    """
+    x, y, vx, vy = (np.array(v, dtype=float) for v in (x, y, vx, vy))
+    n = x.size
+    q = np.broadcast_to(np.eye(4), (n, 4, 4)).copy()
+    log_sum = np.zeros((n, 4))
+    time = np.zeros(n)
+    finite_time = []
+    for i in range(1, n_events + 1):
+        t, x, y, vx, vy, _, _, jac = event_jacobian(
+            x, y, vx, vy, a, b, attraction_point, attraction_radius, gravity)
+        time += np.where(np.isfinite(t), t, 0.0)
+        q = jac @ q
+        if i % renormalize_every == 0 or i == n_events:
+            q, r = np.linalg.qr(q)
+            log_sum += np.log(np.abs(np.diagonal(r, axis1=1, axis2=2)))
+            finite_time.append(log_sum[:, 0] / i)
+    return {
+        "per_event": log_sum / max(n_events, 1),
+        "per_time": log_sum / np.where(time > 0, time, 1.0)[:, None],
+        "finite_time": np.array(finite_time),
+        "state": np.stack([x, y, vx, vy]),
+    }
@@ -0,0 +1,51 @@
+import numpy as np
+
+# Constant-cost point buffers for animations.
+# RingBuffer keeps the last `capacity` points and hands out a contiguous view
+# of them without copying (every point is stored twice, at i and i + capacity).
+# PointBuffer is a preallocated, doubling array of (x, y) points.
+
+
+class RingBuffer:
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.empty((2, 2*self.capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, x, y):
+        i = self._next
+        self._data[:, i] = x, y
+        self._data[:, i + self.capacity] = x, y
+        self._next = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def view(self):
+        """(x, y) views of the stored points, oldest first."""
+        end = self._next + self.capacity if self._count == self.capacity else self._next
+        start = end - self._count
+        return self._data[0, start:end], self._data[1, start:end]
+
+
+class PointBuffer:
+    def __init__(self, capacity=1024):
+        self._data = np.empty((2, max(int(capacity), 1)))
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, x, y):
+        if self._count == self._data.shape[1]:
+            grown = np.empty((2, 2*self._data.shape[1]))
+            grown[:, :self._count] = self._data
+            self._data = grown
+        self._data[:, self._count] = x, y
+        self._count += 1
+
+    def view(self):
+        """(x, y) views of all points."""
+        return self._data[0, :self._count], self._data[1, :self._count]
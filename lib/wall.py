@@ -1,12 +1,5 @@
 import math
-import matplotlib.patches as mpatches
-import matplotlib.path as mpath
-
-codes = [
-    mpath.Path.MOVETO,  # Move to the start point
-    mpath.Path.CURVE3,  # Cubic Bezier curve
-    mpath.Path.CURVE3,
-]
+import numpy as np
 
 
 class wall:
@@ -17,6 +10,15 @@ class wall:
         # Bezier Curve Points (in absolute positions)
     
     def createPatch(self, ax):
+        # matplotlib only for drawing, so the geometry imports without it.
+        import matplotlib.patches as mpatches
+        import matplotlib.path as mpath
+
+        codes = [
+            mpath.Path.MOVETO,  # Move to the start point
+            mpath.Path.CURVE3,  # Cubic Bezier curve
+            mpath.Path.CURVE3,
+        ]
         path = mpath.Path([self.A, self.D, self.B], codes)
         patch = mpatches.PathPatch(path, facecolor='none', lw=2)
         ax.add_patch(patch)
@@ -69,3 +71,50 @@ class wall:
     def getTangentVelocity(self, P: list, V: list, u : float):
         #no clue
         return V
+
+    def intersectRays(self, P, V) -> tuple:
+        #vectorized version of getIntersect for M rays at once
+        #P, V: arrays of shape (M, 2)
+        #returns u, hit points (M, 2) and distances; u = nan, dist = inf for misses
+        A = np.asarray(self.A, dtype=float)
+        B = np.asarray(self.B, dtype=float)
+        D = np.asarray(self.D, dtype=float)
+        u, points, dist = intersectBezierRays(A[None], (2 * (D - A))[None], (A - 2 * D + B)[None], P, V)
+        return u[:, 0], points[:, 0], dist[:, 0]
+
+
+def intersectBezierRays(C0, C1, C2, P, V) -> tuple:
+    #rays P + s V (M, 2) against the curves C0 + C1 u + C2 u^2 (K, 2), u in [0, 1]
+    #returns u (M, K), hit points (M, K, 2) and distances (M, K) of the
+    #nearest forward hit of every ray on every curve; u = nan, dist = inf for misses
+    P = np.atleast_2d(np.asarray(P, dtype=float))
+    V = np.atleast_2d(np.asarray(V, dtype=float))
+
+    #curve point - P parallel to V:  cross(B(u) - P, V) = qa u^2 + qb u + qc = 0
+    #(same equation as findU, multiplied by V[1], so V[1] == 0 is fine)
+    def cross(w):
+        return w[..., 0] * V[:, None, 1] - w[..., 1] * V[:, None, 0]
+    qa = cross(C2[None])
+    qb = cross(C1[None])
+    qc = cross(C0[None] - P[:, None])
+
+    #stable roots: the second tends to the linear root -qc/qb when qa -> 0
+    discriminant = qb * qb - 4 * qa * qc
+    root = np.sqrt(np.where(discriminant >= 0, discriminant, 0.0))
+    q = -0.5 * (qb + np.where(qb >= 0, root, -root))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u = np.stack([q / qa, qc / q], axis=-1)
+    u[(discriminant < 0)[..., None] | ~np.isfinite(u)] = np.nan
+
+    points = C0[None, :, None] + u[..., None] * (C1[None, :, None] + u[..., None] * C2[None, :, None])
+    offset = points - P[:, None, None, :]
+    dot = offset[..., 0] * V[:, None, None, 0] + offset[..., 1] * V[:, None, None, 1]
+    valid = np.isfinite(u) & (u >= 0) & (u <= 1) & (dot > 0)
+    dist = np.where(valid, np.hypot(offset[..., 0], offset[..., 1]), np.inf)
+
+    pick = np.argmin(dist, axis=-1)[..., None]
+    dist = np.take_along_axis(dist, pick, axis=-1)[..., 0]
+    hit = np.isfinite(dist)
+    u = np.where(hit, np.take_along_axis(u, pick, axis=-1)[..., 0], np.nan)
+    points = np.where(hit[..., None], np.take_along_axis(points, pick[..., None], axis=-2)[..., 0, :], np.nan)
+    return u, points, dist
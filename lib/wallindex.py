@@ -0,0 +1,106 @@
+import math
+
+# Broad-phase index for Bezier walls.
+# Every wall lies inside the bounding box of its control points A, D, B, so a
+# bounding volume hierarchy over those boxes lets a ray skip every wall whose
+# box it cannot reach, or reaches only farther away than the best hit so far.
+# Only the remaining walls are tested exactly with wall.getIntersect.
+
+
+def _wallBox(w):
+    xs = (w.A[0], w.D[0], w.B[0])
+    ys = (w.A[1], w.D[1], w.B[1])
+    return [min(xs), min(ys)], [max(xs), max(ys)]
+
+
+def _rayBoxEntry(P, V, lo, hi):
+    # Slab test: smallest s >= 0 with P + s*V inside the box, or None.
+    sMin, sMax = 0.0, math.inf
+    for k in range(2):
+        if V[k] == 0:
+            if P[k] < lo[k] or P[k] > hi[k]:
+                return None
+            continue
+        s1 = (lo[k] - P[k]) / V[k]
+        s2 = (hi[k] - P[k]) / V[k]
+        if s1 > s2:
+            s1, s2 = s2, s1
+        sMin = max(sMin, s1)
+        sMax = min(sMax, s2)
+        if sMin > sMax:
+            return None
+    return sMin
+
+
+class WallIndex:
+    """
+    Bounding volume hierarchy over a list of walls.
+
+    nearest(P, V) returns the same hit as testing every wall and keeping the
+    closest one, but only calls getIntersect for walls whose bounding box the
+    ray reaches before the best hit found so far.
+    """
+
+    def __init__(self, walls: list, leafSize: int = 4) -> None:
+        self.walls = list(walls)
+        boxes = [_wallBox(w) for w in self.walls]
+        self.lo = []
+        self.hi = []
+        self.children = []   # (left, right) node ids, or None for leaves
+        self.items = []      # wall ids of leaves
+        if self.walls:
+            self._build(list(range(len(self.walls))), boxes, leafSize)
+
+    def _build(self, ids, boxes, leafSize):
+        node = len(self.lo)
+        lo = [min(boxes[i][0][k] for i in ids) for k in range(2)]
+        hi = [max(boxes[i][1][k] for i in ids) for k in range(2)]
+        self.lo.append(lo)
+        self.hi.append(hi)
+        self.children.append(None)
+        self.items.append(ids)
+        if len(ids) <= leafSize:
+            return node
+        # Median split of the box centres along the longer axis.
+        axis = 0 if hi[0] - lo[0] >= hi[1] - lo[1] else 1
+        ids = sorted(ids, key=lambda i: boxes[i][0][axis] + boxes[i][1][axis])
+        half = len(ids) // 2
+        left = self._build(ids[:half], boxes, leafSize)
+        right = self._build(ids[half:], boxes, leafSize)
+        self.children[node] = (left, right)
+        self.items[node] = []
+        return node
+
+    def nearest(self, P: list, V: list) -> tuple:
+        """
+        Closest wall hit by the ray from P along V.
+        Returns (wall, intersect, tangentVelocity, dist), or
+        (None, None, None, inf) if no wall is hit.
+        """
+        best = (None, None, None, math.inf)
+        if not self.walls:
+            return best
+        speed = math.hypot(V[0], V[1])
+        entry = _rayBoxEntry(P, V, self.lo[0], self.hi[0])
+        stack = [(entry, 0)] if entry is not None else []
+        while stack:
+            entry, node = stack.pop()
+            if entry * speed > best[3]:
+                continue
+            if self.children[node] is None:
+                for i in self.items[node]:
+                    w = self.walls[i]
+                    intersect, tangentVelocity = w.getIntersect(P, V)
+                    if intersect is not None:
+                        dist = math.hypot(P[0] - intersect[0], P[1] - intersect[1])
+                        if dist < best[3]:
+                            best = (w, intersect, tangentVelocity, dist)
+                continue
+            hits = []
+            for child in self.children[node]:
+                childEntry = _rayBoxEntry(P, V, self.lo[child], self.hi[child])
+                if childEntry is not None:
+                    hits.append((childEntry, child))
+            # Visit the nearer child first (it is pushed last).
+            stack.extend(sorted(hits, reverse=True))
+        return best
@@ -0,0 +1,84 @@
+import numpy as np
+
+from lib.wall import wall, intersectBezierRays
+
+# Array-backed collection of Bezier walls.
+# Control points and the polynomial coefficients of every wall
+#      B(u) = C0 + C1 u + C2 u^2,   C0 = A, C1 = 2(D - A), C2 = A - 2D + B
+# are computed once and kept in contiguous read-only (K, 2) arrays (C0 is
+# the A array itself), so sweeps over many rays and walls run as NumPy
+# operations instead of per-object attribute lookups.
+
+
+class WallSet:
+    def __init__(self, A, B, D) -> None:
+        #A: start points, B: end points, D: curve (control) points, each (K, 2)
+        arrays = [np.array(X, dtype=float).reshape(-1, 2) for X in (A, B, D)]
+        self.A, self.B, self.D = arrays
+        self.C0 = self.A
+        self.C1 = 2 * (self.D - self.A)
+        self.C2 = self.A - 2 * self.D + self.B
+        points = np.stack(arrays, axis=1)
+        self.lo = points.min(axis=1)
+        self.hi = points.max(axis=1)
+        for X in (self.A, self.B, self.D, self.C1, self.C2, self.lo, self.hi):
+            X.setflags(write=False)
+
+    @classmethod
+    def fromWalls(cls, walls: list) -> "WallSet":
+        return cls([w.A for w in walls], [w.B for w in walls], [w.D for w in walls])
+
+    @classmethod
+    def fromFile(cls, path) -> "WallSet":
+        #.npz with arrays A, B, D, or a text file with one wall per line:
+        #Ax Ay Bx By Dx Dy  (same order as wall(Start, End, Curve))
+        if str(path).endswith(".npz"):
+            with np.load(path) as data:
+                return cls(data["A"], data["B"], data["D"])
+        rows = np.loadtxt(path, ndmin=2)
+        return cls(rows[:, 0:2], rows[:, 2:4], rows[:, 4:6])
+
+    def save(self, path) -> None:
+        np.savez(path, A=self.A, B=self.B, D=self.D)
+
+    def toWalls(self) -> list:
+        return [wall(list(a), list(b), list(d)) for a, b, d in zip(self.A.tolist(), self.B.tolist(), self.D.tolist())]
+
+    def __len__(self) -> int:
+        return self.A.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(X.nbytes for X in (self.A, self.B, self.D, self.C1, self.C2, self.lo, self.hi))
+
+    def getPoints(self, index, u):
+        #points B(u) of the walls index (arrays of the same shape)
+        index = np.asarray(index)
+        u = np.asarray(u, dtype=float)[..., None]
+        return self.C0[index] + u * (self.C1[index] + u * self.C2[index])
+
+    def intersectRays(self, P, V, chunk: int = 4096) -> tuple:
+        #nearest wall hit for each of M rays (P, V: (M, 2))
+        #returns wall index (-1 for misses), u, hit points (M, 2) and distances
+        P = np.atleast_2d(np.asarray(P, dtype=float))
+        V = np.atleast_2d(np.asarray(V, dtype=float))
+        m = P.shape[0]
+        index = np.full(m, -1)
+        u = np.full(m, np.nan)
+        points = np.full((m, 2), np.nan)
+        dist = np.full(m, np.inf)
+        if len(self) == 0:
+            return index, u, points, dist
+        #rays are processed in chunks to bound the (rays x walls) temporaries
+        step = max(1, chunk // len(self))
+        for start in range(0, m, step):
+            rows = slice(start, start + step)
+            uk, pk, dk = intersectBezierRays(self.C0, self.C1, self.C2, P[rows], V[rows])
+            pick = np.argmin(dk, axis=1)
+            r = np.arange(dk.shape[0])
+            dist[rows] = dk[r, pick]
+            hit = np.isfinite(dist[rows])
+            index[rows] = np.where(hit, pick, -1)
+            u[rows] = np.where(hit, uk[r, pick], np.nan)
+            points[rows] = np.where(hit[:, None], pk[r, pick], np.nan)
+        return index, u, points, dist
@@ -1,13 +1,13 @@
 import matplotlib.pyplot as plt
 import numpy as np
 
-import pymunk
-from pymunk import Vec2d
-
 from matplotlib.patches import Polygon
 
 from matplotlib.animation import FuncAnimation
 
+from lib.polygon import COLLISION_DTYPE
+from lib.replay import FRAME_DTYPE, record_polygon, save_record, load_record, play
+
 fig, (view1, view2) = plt.subplots(1, 2)
 
 view1.set_xlim(-0.1, 1.1)
@@ -19,7 +19,15 @@ view2.set_xlim(0,200)
 triangle_vertices = [(0, 0), (1, 0), (0.5, np.sqrt(3)/2)]
 ball_radius = 0.05
 ball_mass = 1
-ball_velocity = Vec2d(2, 2)
+ball_velocity = (2, 2)
+
+run_mode = "live"        # "live" (one space.step per drawn frame), "record" (headless run, then replay)
+                         # or "replay" (play the record saved at record_path)
+record_engine = "pymunk" # "pymunk" or "exact" (event-driven, lib.polygon) for run_mode = "record"
+n_frames = 200
+record_path = None       # e.g. "triangle_record.npz" to keep the record
+replay_window = (0, None)
+trail_length = None      # None: whole trail since the start of the window
 
 ball, = view1.plot([], [], 'bo', markersize=10)
 trajectory_line, = view1.plot([],[], 'b-', alpha=0.5)
@@ -38,7 +46,10 @@ triangle_patch = Polygon(triangle_vertices, closed=True, fill=False, color='blac
 view1.add_patch(triangle_patch)
 
 def setup():
-    global space, ball_body, triangle_vertices
+    # pymunk is only needed by the modes that step a pymunk space.
+    global space, ball_body, handler, triangle_vertices
+    import pymunk
+
     space = pymunk.Space()
     space.gravity = (0, 0)
 
@@ -60,8 +71,8 @@ def setup():
     ball_shape = pymunk.Circle(ball_body, ball_radius)
     ball_shape.elasticity = 1.0
     space.add(ball_body, ball_shape)
-
-setup()
+    handler = space.add_default_collision_handler()
+    handler.post_solve = collision_handler
 
 def calculate_angle(velocity):
     angle = np.degrees(np.arctan2(velocity[1], velocity[0]))
@@ -83,9 +94,6 @@ def collision_handler(arbiter, space, data):
     return True  
 
 
-handler = space.add_default_collision_handler()
-handler.post_solve = collision_handler
-
 def update(frame):
     handler.data['frame'] = frame
 
@@ -116,6 +124,44 @@ def update(frame):
 
     return ball, trajectory_line, angleline
 
-ani = FuncAnimation(fig, update, frames=200, interval=10, blit=True)
+def record_collision(arbiter, space, data):
+    v = ball_body.velocity
+    p = ball_body.position
+    data['rows'].append((0, (data['frame'] + 1)*0.01, data['frame'], p.x, p.y, v.x, v.y, calculate_angle(v), -1))
+    return True
+
+def record_run(n_frames):
+    # Same physics as update, without drawing; the state goes straight into columns.
+    frames = np.empty(n_frames, dtype=FRAME_DTYPE)
+    handler.data['rows'] = []
+    handler.post_solve = record_collision
+    for frame in range(n_frames):
+        handler.data['frame'] = frame
+        space.step(0.01)
+        p, v = ball_body.position, ball_body.velocity
+        frames[frame] = (frame, p.x, p.y, v.x, v.y)
+    return frames, np.array(handler.data['rows'], dtype=COLLISION_DTYPE)
+
+if run_mode == "live" or (run_mode == "record" and record_engine == "pymunk"):
+    setup()
+
+if run_mode == "live":
+    ani = FuncAnimation(fig, update, frames=n_frames, interval=10, blit=True)
+else:
+    if run_mode == "record":
+        if record_engine == "exact":
+            frames, collisions = record_polygon(triangle_vertices, (0.5, 0.25), tuple(ball_velocity), n_frames,
+                                                dt=0.01, radius=ball_radius)
+        else:
+            frames, collisions = record_run(n_frames)
+        if record_path:
+            save_record(record_path, frames, collisions, vertices=triangle_vertices, dt=0.01)
+    else:
+        frames, collisions, meta = load_record(record_path)
+    start, stop = replay_window
+    stop = frames.size if stop is None else stop
+    view2.set_xlim(start, stop)
+    ani = play(fig, view1, view2, frames, collisions, start, stop, trail_length=trail_length,
+               artists=(ball, trajectory_line, angleline))
 
 plt.show()
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from lib.checkpoint import LongRun, run_with_checkpoints
+
+FIELDS = ("x", "y", "vx", "vy", "t", "num_edge", "num_field")
+
+
+def assert_same_run(resumed, direct):
+    assert resumed.events_done == direct.events_done
+    for name in FIELDS:
+        np.testing.assert_array_equal(getattr(resumed, name), getattr(direct, name))
+    np.testing.assert_array_equal(resumed.histogram.counts, direct.histogram.counts)
+    assert resumed.histogram.outside == direct.histogram.outside
+    assert resumed.rng.bit_generator.state == direct.rng.bit_generator.state
+
+
+@pytest.mark.parametrize("gravity", [0.0, 0.5])
+def test_resume_is_bit_identical(tmp_path, gravity):
+    kwargs = dict(seed=3, attraction_point=(0.5, 0.2), gravity=gravity, bins=(64, 64))
+    direct = LongRun.random(100, 4.0, 2.0, **kwargs)
+    direct.advance(300)
+
+    path = tmp_path / "run.npz"
+    first = LongRun.random(100, 4.0, 2.0, **kwargs)
+    first.advance(120)
+    first.save(path)
+    resumed = LongRun.load(path)
+    resumed.advance(180)
+    assert_same_run(resumed, direct)
+
+
+def test_run_with_checkpoints_resumes(tmp_path):
+    path = tmp_path / "run.npz"
+    direct = LongRun.random(50, 4.0, 2.0, seed=5, gravity=0.5)
+    direct.advance(250)
+
+    run_with_checkpoints(LongRun.random(50, 4.0, 2.0, seed=5, gravity=0.5), 100, path, every=40)
+    resumed = run_with_checkpoints(LongRun.load(path), 250, path, every=40)
+    assert_same_run(resumed, direct)
+    assert_same_run(LongRun.load(path), direct)
+    assert [p.name for p in tmp_path.iterdir()] == ["run.npz"]
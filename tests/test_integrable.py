@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from lib.integrable import advance_bounces, cross_check, jump_to_bounce
+
+
+def random_states(n, a, b, seed=4):
+    rng = np.random.default_rng(seed)
+    r = 0.95*np.sqrt(rng.random(n))
+    phi = 2*np.pi*rng.random(n)
+    angle = 2*np.pi*rng.random(n)
+    return a*r*np.cos(phi), b*r*np.sin(phi), np.cos(angle), np.sin(angle)
+
+
+@pytest.mark.parametrize("a, b", [(4.0, 2.0), (2.0, 4.0), (2.0, 2.0), (5.0, 0.5), (0.5, 5.0)])
+def test_jump_matches_stepping(a, b):
+    states = random_states(200, a, b)
+    deviation, n_closed = cross_check(*states, 1000, a, b)
+    assert n_closed >= 195
+    assert deviation < 1e-7
+
+
+def test_advance_bounces_without_field_is_the_jump():
+    states = random_states(50, 4.0, 2.0)
+    jumped = jump_to_bounce(*states, 300, 4.0, 2.0)
+    advanced = advance_bounces(*states, 300, 4.0, 2.0, (0.0, 0.0), 0.5, 0.0)
+    for j, s in zip(jumped, advanced):
+        np.testing.assert_array_equal(j, s)
@@ -0,0 +1,19 @@
+import pytest
+
+from lib.periodic import find_periodic_orbits
+
+
+def test_no_period_one_orbits():
+    assert find_periodic_orbits(1, 4.0, 2.0) == []
+
+
+def test_two_periodic_traces_of_the_ellipse():
+    # Axis orbits: Tr M = 4 (1 - L/R)^2 - 2 with chord length L and the
+    # radius of curvature R at the bounce points.
+    a, b = 4.0, 2.0
+    orbits = find_periodic_orbits(2, a, b)
+    traces = sorted(o["trace"] for o in orbits)
+    minor = 4*(1 - 2*b/(a**2/b))**2 - 2
+    major = 4*(1 - 2*a/(b**2/a))**2 - 2
+    assert traces == pytest.approx([minor, major], rel=1e-4, abs=1e-4)
+    assert all(o["period"] == 2 for o in orbits)
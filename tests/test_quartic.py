@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from lib.ensemble import next_event
+from lib.models import linear_next_event
+from lib.quartic import smallest_positive_root
+
+
+def field_quartics(n, gravity, seed=0):
+    """Frozen-acceleration exit quartics of random starts inside the unit circle."""
+    rng = np.random.default_rng(seed)
+    r = 0.999*np.sqrt(rng.random(n))
+    phi = 2*np.pi*rng.random(n)
+    angle = 2*np.pi*rng.random(n)
+    dx, dy = r*np.cos(phi), r*np.sin(phi)
+    vx, vy = np.cos(angle), np.sin(angle)
+    ax, ay = -gravity*dx/r, -gravity*dy/r
+    return np.stack([0.25*(ax**2 + ay**2), vx*ax + vy*ay, vx**2 + vy**2 + dx*ax + dy*ay,
+                     2*(dx*vx + dy*vy), dx**2 + dy**2 - 1], axis=1)
+
+
+def linear_quartics(n, gravity, seed=0):
+    """Entry quartics of the linear model (lib.models) from random starts outside the unit circle."""
+    rng = np.random.default_rng(seed)
+    r = 1 + 3*rng.random(n)
+    phi = 2*np.pi*rng.random(n)
+    angle = 2*np.pi*rng.random(n)
+    dx, dy = r*np.cos(phi), r*np.sin(phi)
+    vx, vy = np.cos(angle), np.sin(angle)
+    ax, ay = gravity*dx, gravity*dy
+    return np.stack([ax**2 + ay**2, 2*(ax*vx + ay*vy), 2*(ax*dx + ay*dy) + vx**2 + vy**2,
+                     2*(dx*vx + dy*vy), dx**2 + dy**2 - 1], axis=1)
+
+
+def np_roots_smallest(coeffs):
+    out = []
+    for row in coeffs:
+        roots = np.roots(row)
+        real = roots[(np.abs(roots.imag) < 1e-9) & (roots.real > 1e-12)].real
+        out.append(real.min() if real.size else np.inf)
+    return np.array(out)
+
+
+@pytest.mark.parametrize("gravity", [1e-9, 1e-6, 1e-3, 1e-1, 1.0, 1e2])
+def test_matches_np_roots(gravity):
+    coeffs = field_quartics(500, gravity)
+    t = smallest_positive_root(coeffs)
+    reference = np_roots_smallest(coeffs)
+    assert np.all(np.isfinite(t))
+    np.testing.assert_allclose(t, reference, rtol=1e-9)
+
+
+@pytest.mark.parametrize("gravity", [1e-9, 1e-8, 1e-6, 1e-4, 1e-2, 1.0])
+def test_matches_np_roots_outside(gravity):
+    coeffs = linear_quartics(2000, gravity)
+    t = smallest_positive_root(coeffs)
+    reference = np_roots_smallest(coeffs)
+    assert np.any(np.isfinite(reference))
+    np.testing.assert_allclose(t, reference, rtol=1e-8)
+
+
+def test_weak_field_entry_is_not_skipped():
+    t, x, y, vx, vy, hit_ellipse, hit_field = linear_next_event(-2.0, 0.05, 1.0, 0.0, 4.0, 2.0, (0.0, 0.0), 0.5,
+                                                                1e-9)
+    assert hit_field and not hit_ellipse
+    assert t == pytest.approx(2 - np.sqrt(0.25 - 0.05**2), rel=1e-6)
+
+
+def test_weak_field_exit_is_not_skipped():
+    t, x, y, vx, vy, hit_ellipse, hit_field = next_event(0.1, 0.05, 1.0, 0.0, 4.0, 2.0, (0.0, 0.0), 0.5, 1e-9)
+    assert hit_field and not hit_ellipse
+    assert t == pytest.approx(np.sqrt(0.25 - 0.05**2) - 0.1, rel=1e-9)
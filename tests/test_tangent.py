@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from lib.ensemble import next_event
+from lib.tangent import event_jacobian, propagate
+
+A, B, POINT, RADIUS = 4.0, 2.0, (0.5, 0.2), 1.0
+
+
+def random_states(n, seed=8):
+    rng = np.random.default_rng(seed)
+    r = 0.9*np.sqrt(rng.random(n))
+    phi = 2*np.pi*rng.random(n)
+    angle = 2*np.pi*rng.random(n)
+    return np.stack([A*r*np.cos(phi), B*r*np.sin(phi), np.cos(angle), np.sin(angle)])
+
+
+def finite_differences(f, state, h=1e-7):
+    """Central differences (N, 4, 4) of f: (4, N) -> (4, N)."""
+    jac = np.empty((state.shape[1], 4, 4))
+    for k in range(4):
+        step = np.zeros((4, 1))
+        step[k] = h
+        jac[:, :, k] = ((f(state + step) - f(state - step)) / (2*h)).T
+    return jac
+
+
+def relative_error(exact, approx):
+    return np.abs(exact - approx).max(axis=(1, 2)) / (1 + np.abs(exact).max(axis=(1, 2)))
+
+
+# States sitting on the ellipse or the field circle are not differentiable in
+# every direction (a step off the surface changes the event), so the event
+# Jacobian is checked from generic points inside the table; with gravity
+# the ones starting inside the field exercise the frozen-acceleration map.
+@pytest.mark.parametrize("gravity", [0.0, 0.3])
+def test_event_jacobian_matches_finite_differences(gravity):
+    state = random_states(300)
+    *_, hit_e, hit_f, exact = event_jacobian(*state, A, B, POINT, RADIUS, gravity)
+    assert np.all(hit_e | hit_f)
+    assert np.count_nonzero(np.hypot(state[0] - POINT[0], state[1] - POINT[1]) < RADIUS) > 20
+    approx = finite_differences(lambda s: np.stack(next_event(*s, A, B, POINT, RADIUS, gravity)[1:5]), state)
+    assert np.max(relative_error(exact, approx)) < 1e-6
+
+
+def test_propagate_matches_finite_differences():
+    state = random_states(300)
+    exact = propagate(*state, 10, A, B, POINT, RADIUS, 0.0)[4]
+    approx = finite_differences(lambda s: np.stack(propagate(*s, 10, A, B, POINT, RADIUS, 0.0)[:4]), state)
+    assert np.quantile(relative_error(exact, approx), 0.99) < 1e-6